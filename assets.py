@@ -0,0 +1,132 @@
+import glob
+import hashlib
+import json
+import os
+import struct
+
+import pygame
+
+MAGIC = b"PYHA"
+VERSION = 1
+_HEADER = struct.Struct("<4sBI")  # magic, version, json length
+PADDING = 2  # px between packed images, so filtering never bleeds across
+
+
+class Atlas:
+    """Prepared images packed into one surface.
+
+    atlas[name] is a subsurface of `surface`, so every image blits from
+    the same texture.
+    """
+
+    def __init__(self, surface, rects):
+        self.surface = surface
+        self.rects = rects
+        self.images = {name: surface.subsurface(r) for name, r in rects.items()}
+
+    def __getitem__(self, name):
+        return self.images[name]
+
+
+def _source_key(entries):
+    """Hash of every entry's name, scale and source file contents."""
+    h = hashlib.sha1(b"%d" % VERSION)
+    digests = {}
+    for name, path, scale in entries:
+        if path not in digests:
+            with open(path, "rb") as f:
+                digests[path] = hashlib.sha1(f.read()).hexdigest()
+        h.update(f"{name}|{scale}|{digests[path]}\n".encode())
+    return h.hexdigest()
+
+
+def _pack(sizes, max_width=2048):
+    """Shelf-pack {name: (w, h)}, tallest first; returns rects and atlas size."""
+    max_width = max([max_width] + [w for w, _ in sizes.values()])
+    rects = {}
+    x = y = shelf_h = 0
+    for name in sorted(sizes, key=lambda n: -sizes[n][1]):
+        w, h = sizes[name]
+        if x + w > max_width:
+            x, y = 0, y + shelf_h + PADDING
+            shelf_h = 0
+        rects[name] = (x, y, w, h)
+        x += w + PADDING
+        shelf_h = max(shelf_h, h)
+    width = max((r[0] + r[2] for r in rects.values()), default=1)
+    return rects, (width, y + shelf_h or 1)
+
+
+def build_atlas(entries):
+    """Load, scale and pack (name, path, scale) entries into an Atlas."""
+    sources = {}
+    images = {}
+    for name, path, scale in entries:
+        if path not in sources:
+            sources[path] = pygame.image.load(path)
+        img = sources[path]
+        if scale != 1:
+            img = pygame.transform.rotozoom(img, 0, scale)
+        images[name] = img
+
+    rects, size = _pack({name: img.get_size() for name, img in images.items()})
+    surface = pygame.Surface(size, pygame.SRCALPHA)
+    for name, img in images.items():
+        surface.blit(img, rects[name][:2])
+    return Atlas(surface, rects)
+
+
+def save_atlas(path, atlas):
+    """Write the atlas as one raw RGBA blob, atomically."""
+    meta = json.dumps({"size": atlas.surface.get_size(), "rects": atlas.rects})
+    meta = meta.encode()
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(meta)))
+        f.write(meta)
+        f.write(pygame.image.tobytes(atlas.surface, "RGBA"))
+    os.replace(tmp, path)
+
+
+def read_atlas(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, meta_len = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a pyhill atlas")
+    start = _HEADER.size + meta_len
+    meta = json.loads(data[_HEADER.size : start])
+    surface = pygame.image.frombytes(data[start:], tuple(meta["size"]), "RGBA")
+    return Atlas(surface, {name: tuple(r) for name, r in meta["rects"].items()})
+
+
+def load_atlas(entries, cache_dir=None, convert=True):
+    """The Atlas for `entries`, from cache_dir when it was built before.
+
+    Cache files are named after a hash of the entries and their source
+    files, so editing an image or changing a scale rebuilds the atlas;
+    the stale files are deleted once the new one is saved. With convert
+    the atlas is converted to the display format once, after loading.
+    """
+    atlas = None
+    path = None
+    if cache_dir:
+        path = os.path.join(cache_dir, f"atlas-{_source_key(entries)}.bin")
+        try:
+            atlas = read_atlas(path)
+        except (OSError, ValueError, struct.error):
+            atlas = None
+    if atlas is None:
+        atlas = build_atlas(entries)
+        if path:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                save_atlas(path, atlas)
+                for stale in glob.glob(os.path.join(cache_dir, "atlas-*.bin")):
+                    if stale != path:
+                        os.remove(stale)
+            except OSError:
+                pass  # a read-only cache just means building every launch
+    if convert:
+        atlas = Atlas(atlas.surface.convert_alpha(), atlas.rects)
+    return atlas
@@ -0,0 +1,589 @@
+"""Benchmarks for pyhill.
+
+Run from the repository root:
+
+    python bench.py terrain --km 50
+    python bench.py terrain --km 50 --legacy
+    python bench.py game
+    python bench.py game --scenario hills --mode render --out hills.json
+    python bench.py entities
+    python bench.py startup
+    python bench.py startup --blocking --cold
+    python bench.py store --runs 100000
+
+`game` runs fixed, seeded scenarios through main.game_loop, each in a
+fresh process, headless and/or rendering to an offscreen surface, and
+prints one JSON report per scenario and mode.
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pymunk
+
+from effects import FloatingText
+from entities import Cloud, Coin, GasCan
+from heightfield import Heightfield
+from store import STAT_KEYS, PlayerStore, SqlitePlayerStore
+from terrain import Terrain
+
+PPM = 30
+BUFFER_AHEAD = 6000
+BUFFER_BEHIND = 2000
+
+
+def bench_terrain(km=50, steps_per_km=200, legacy=False):
+    """Drive a box along the track for `km` kilometres and time space.step.
+
+    The box is teleported along the surface every step so the run length
+    doesn't depend on handling. With --legacy chunks are never retired,
+    which is how the track behaved before it was chunked.
+    """
+    space = pymunk.Space()
+    space.gravity = (0, 500)
+    heightfield = Heightfield()
+    terrain = Terrain(space, heightfield)
+    terrain.extend_to(BUFFER_AHEAD)
+
+    body = pymunk.Body(8, pymunk.moment_for_box(8, (120, 40)))
+    shape = pymunk.Poly.create_box(body, (120, 40), radius=14)
+    space.add(body, shape)
+
+    dt = 1 / 60
+    advance = 1000 * PPM / steps_per_km
+    results = []
+    x = 200.0
+    for k in range(1, km + 1):
+        step_ns = 0
+        query_ns = 0
+        for _ in range(steps_per_km):
+            x += advance
+            body.position = (x, heightfield.track_y(x) - 30)
+            body.velocity = (advance / dt, 0)
+            body.angular_velocity = 0
+
+            t0 = time.perf_counter_ns()
+            space.shape_query(shape)
+            t1 = time.perf_counter_ns()
+            space.step(dt)
+            t2 = time.perf_counter_ns()
+            query_ns += t1 - t0
+            step_ns += t2 - t1
+
+            terrain.extend_to(x + BUFFER_AHEAD)
+            if not legacy:
+                terrain.retire_before(x - BUFFER_BEHIND)
+
+        results.append(
+            {
+                "km": k,
+                "shapes": len(space.shapes),
+                "step_us": round(step_ns / steps_per_km / 1000, 2),
+                "query_us": round(query_ns / steps_per_km / 1000, 2),
+            }
+        )
+    return results
+
+
+# ===== ENTITIES =====
+ENTITY_KINDS = {
+    "coin": (
+        lambda i: {"x": i, "y": 0.0, "collected": False, "value": 5, "image": None},
+        lambda i: Coin(i, 0.0, 5, None),
+    ),
+    "gas_can": (
+        lambda i: {"x": i, "y": 0.0, "collected": False},
+        lambda i: GasCan(i, 0.0),
+    ),
+    "cloud": (
+        lambda i: {"x": i, "y": 0.0, "speed": 0.2, "img": None},
+        lambda i: Cloud(i, 0.0, 0.2, None),
+    ),
+    "floating_text": (
+        lambda i: {"text": "+5", "x": i, "y": 0.0, "timer": 1.0, "color": (0, 0, 0)},
+        lambda i: FloatingText(),
+    ),
+}
+
+
+def _bytes_per_entity(make, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [make(float(i)) for i in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del items
+    return round(used / count, 1)
+
+
+def _pickup_pass_dict(coins, frames):
+    t0 = time.perf_counter_ns()
+    for f in range(frames):
+        car_x = car_y = float(f)
+        for coin in coins:
+            if not coin["collected"]:
+                dx = coin["x"] - car_x
+                dy = coin["y"] - car_y
+                if dx * dx + dy * dy < 400:
+                    coin["value"] += 0
+    return time.perf_counter_ns() - t0
+
+
+def _pickup_pass_slots(coins, frames):
+    t0 = time.perf_counter_ns()
+    for f in range(frames):
+        car_x = car_y = float(f)
+        for coin in coins:
+            if not coin.collected:
+                dx = coin.x - car_x
+                dy = coin.y - car_y
+                if dx * dx + dy * dy < 400:
+                    coin.value += 0
+    return time.perf_counter_ns() - t0
+
+
+def bench_entities(count=2000, frames=300):
+    """Dict entities against the slotted classes that replaced them.
+
+    Reports traced bytes per live entity for each kind, and the time of
+    a coin pickup-style pass (three reads per entity) over `count` coins
+    for `frames` frames.
+    """
+    memory = {}
+    for kind, (make_dict, make_obj) in ENTITY_KINDS.items():
+        memory[kind] = {
+            "dict_bytes": _bytes_per_entity(make_dict, count),
+            "slots_bytes": _bytes_per_entity(make_obj, count),
+        }
+
+    make_dict, make_obj = ENTITY_KINDS["coin"]
+    dict_ns = _pickup_pass_dict([make_dict(float(i)) for i in range(count)], frames)
+    slots_ns = _pickup_pass_slots([make_obj(float(i)) for i in range(count)], frames)
+    per = count * frames
+    return {
+        "count": count,
+        "frames": frames,
+        "memory": memory,
+        "pickup_ns_per_entity": {
+            "dict": round(dict_ns / per, 2),
+            "slots": round(slots_ns / per, 2),
+        },
+    }
+
+
+# ===== STARTUP =====
+class _FirstFrame(Exception):
+    pass
+
+
+def _startup_worker(background, cold):
+    """Start the game up to its first main menu frame, then let the assets finish.
+
+    Prints "first-frame" the moment the menu is presented so the parent
+    can time it from process launch, then a JSON line of in-process times.
+    """
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    t0 = time.perf_counter()
+    import pygame
+
+    import main as game
+
+    t_import = time.perf_counter()
+    # players start empty in a scratch directory, so the bench never
+    # migrates or writes the real ones
+    tmp = tempfile.TemporaryDirectory()
+    game.PLAYERS_FILE = os.path.join(tmp.name, "players.json")
+    game.RUNS_FILE = os.path.join(tmp.name, "runs.jsonl")
+    game.PLAYERS_DB = os.path.join(tmp.name, "players.db")
+    if cold:
+        game.ASSET_CACHE_DIR = os.path.join(tmp.name, "cache")
+
+    flip = pygame.display.flip
+
+    def first_flip():
+        flip()
+        raise _FirstFrame
+
+    pygame.display.flip = first_flip
+    game.init_display(headless=False, background=background)
+    t_display = time.perf_counter()
+    game.players = game.load_players()
+    try:
+        game.main_menu()
+    except _FirstFrame:
+        pass
+    t_frame = time.perf_counter()
+    print("first-frame", flush=True)
+    game.wait_for_assets()
+    t_assets = time.perf_counter()
+    game.player_store.close()
+    tmp.cleanup()
+
+    def ms(t):
+        return round((t - t0) * 1000, 1)
+
+    return {
+        "import_ms": ms(t_import),
+        "display_ms": ms(t_display),
+        "first_frame_ms": ms(t_frame),
+        "assets_ms": ms(t_assets),
+    }
+
+
+def bench_startup(background=True, cold=False, repeat=5):
+    """Time-to-first-frame of the main menu, over `repeat` fresh processes.
+
+    first_frame_ms is measured by the parent from launching the process
+    to the menu being presented, so it includes interpreter start and
+    imports; the in-process times (medians) break that down.
+    """
+    cmd = [sys.executable, __file__, "startup", "--worker"]
+    if not background:
+        cmd.append("--blocking")
+    if cold:
+        cmd.append("--cold")
+    else:
+        subprocess.run(cmd, check=True, capture_output=True)  # warm the atlas cache
+
+    wall = []
+    inner = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+        for line in proc.stdout:
+            if line.strip() == "first-frame":
+                wall.append((time.perf_counter() - start) * 1000)
+                break
+        out = proc.stdout.read()
+        if proc.wait() != 0:
+            raise RuntimeError("startup worker failed")
+        inner.append(json.loads(out.strip().splitlines()[-1]))
+
+    return {
+        "mode": "background" if background else "blocking",
+        "cache": "cold" if cold else "warm",
+        "runs": repeat,
+        "first_frame_ms": {
+            "median": round(statistics.median(wall), 1),
+            "min": round(min(wall), 1),
+            "max": round(max(wall), 1),
+        },
+        "in_process_ms": {
+            key: statistics.median(r[key] for r in inner) for key in inner[0]
+        },
+    }
+
+
+# ===== STORE =====
+def _seed_run_log(path, runs, players, seed=1):
+    """Write a JSON run log of `runs` random runs spread over `players`."""
+    rng = random.Random(seed)
+    records = [{"type": "player", "player": f"P{i}"} for i in range(players)]
+    for _ in range(runs):
+        records.append(
+            {
+                "type": "run",
+                "player": f"P{rng.randrange(players)}",
+                "distance": rng.randrange(5000),
+                "coins": rng.randrange(3000),
+                "flips": rng.randrange(40),
+                "time": "2025-01-01 12:00",
+            }
+        )
+    with open(path, "w") as f:
+        f.writelines(json.dumps(rec) + "\n" for rec in records)
+
+
+def _time_ms(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return round(best * 1000, 3)
+
+
+def _store_queries(make, players, record, repeat):
+    def load():
+        store = make()
+        store.load()
+        store.close()
+
+    store = make()
+    store.load()
+    row = {"load_ms": _time_ms(load, repeat)}
+    for key in STAT_KEYS:
+        row[f"top10_{key}_ms"] = _time_ms(lambda k=key: store.top_runs(k, 10), repeat)
+    row["page_5000_ms"] = _time_ms(lambda: store.top_runs("distance", 10, 5000), repeat)
+    row["player_top10_ms"] = _time_ms(
+        lambda: store.top_runs("distance", 10, player="P7"), repeat
+    )
+    row["top10_players_ms"] = _time_ms(
+        lambda: store.top_players("distance", 10), repeat
+    )
+    store.close()
+
+    # recording: the caller's time per run, written inline and in the background
+    for mode, background in (("sync", False), ("background", True)):
+        store = make(background=background)
+        store.load()
+        times = []
+        for i in range(record):
+            t0 = time.perf_counter()
+            store.record_run(f"P{i % players}", i, i, i % 40, "2025-01-02 12:00")
+            times.append(time.perf_counter() - t0)
+            time.sleep(0.002)  # runs end a game apart, not back to back
+        t0 = time.perf_counter()
+        store.close()
+        row[f"record_{mode}_ms"] = round(statistics.mean(times) * 1000, 3)
+        row[f"record_{mode}_max_ms"] = round(max(times) * 1000, 3)
+        row[f"close_{mode}_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+    return row
+
+
+def bench_store(runs=100000, players=1000, record=500, repeat=5):
+    """JSON log store against SQLite with `runs` runs over `players` players.
+
+    Both start from the same seeded JSON log; the SQLite database is made
+    by migrating it. Query times are the best of `repeat`; recording is
+    the caller's mean and worst time over `record` more runs, 2 ms
+    apart, fsynced every time, written inline and then on the background
+    writer (whose queue close drains).
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        summary = os.path.join(tmp, "players.json")
+        log = os.path.join(tmp, "runs.jsonl")
+        _seed_run_log(log, runs, players)
+
+        results = {"runs": runs, "players": players}
+        t0 = time.perf_counter()
+        json_store = PlayerStore(summary, log)
+        json_store.load()
+        results["json_first_load_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+
+        t0 = time.perf_counter()
+        sql_store = SqlitePlayerStore(os.path.join(tmp, "players.db"))
+        sql_store.load(PlayerStore(summary, log))
+        results["sqlite_migrate_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        sql_store.close()
+
+        results["json"] = _store_queries(
+            lambda **kw: PlayerStore(summary, log, **kw), players, record, repeat
+        )
+        results["sqlite"] = _store_queries(
+            lambda **kw: SqlitePlayerStore(os.path.join(tmp, "players.db"), **kw),
+            players,
+            record,
+            repeat,
+        )
+    return results
+
+
+# ===== GAME SCENARIOS =====
+def _flat(game):
+    game.amp1 = game.amp2 = 0
+    game.fuel_deplete_rate = game.fuel_accel_drain = 0
+    return 60, game.make_autopilot(600)
+
+
+def _hills(game):
+    game.fuel_deplete_rate = game.fuel_accel_drain = 0
+    return 60, game.make_autopilot()
+
+
+def _airborne(game):
+    # low gravity and the left key held: long flips over the hills
+    game.gravity = (0, 80)
+    game.fuel_deplete_rate = game.fuel_accel_drain = 0
+    return 60, lambda: game.INPUT_LEFT
+
+
+def _low_fuel(game):
+    # the smart gas spawn check runs on every frame
+    game.low_fuel_threshold = 100
+    return 60, game.make_autopilot(600)
+
+
+def _endurance(game):
+    game.fuel_deplete_rate = game.fuel_accel_drain = 0
+    return 600, game.make_autopilot(600)
+
+
+GAME_SCENARIOS = {
+    "flat": _flat,
+    "hills": _hills,
+    "airborne": _airborne,
+    "low_fuel": _low_fuel,
+    "endurance": _endurance,
+}
+GAME_MODES = ("headless", "render")
+
+
+def _percentiles(values_ns):
+    if not values_ns:
+        return None
+    ms = sorted(v / 1e6 for v in values_ns)
+
+    def pct(p):
+        return round(ms[min(len(ms) - 1, int(p / 100 * len(ms)))], 4)
+
+    return {
+        "mean": round(sum(ms) / len(ms), 4),
+        "p50": pct(50),
+        "p90": pct(90),
+        "p99": pct(99),
+        "max": round(ms[-1], 4),
+    }
+
+
+def bench_game(scenario, mode, size=None):
+    """Run one scenario in this process and return its report.
+
+    A run that ends early (game over) is restarted with the next seed
+    until the scenario's simulated time is used up.
+    """
+    import main as game
+    from profiler import DRAW_STAGES, STAGES, FrameProfiler
+
+    if size:
+        game.HEADLESS_SIZE = size
+    game.init_display(headless=True)
+    seconds, controls = GAME_SCENARIOS[scenario](game)
+
+    profiler = FrameProfiler()
+    ticks = int(seconds * game.physics_hz)
+    runs = []
+    seed = 1
+    start = time.perf_counter()
+    while len(profiler.frames) < ticks:
+        reason = game.game_loop(
+            controls,
+            render=mode == "render",
+            max_ticks=ticks - len(profiler.frames),
+            seed=seed,
+            profiler=profiler,
+        )
+        runs.append(
+            {
+                "seed": seed,
+                "reason": reason,
+                "ticks": len(game.input_log),
+                "distance": int(game.distance_traveled),
+                "coins": game.coin_score,
+                "flips": game.flip_count,
+            }
+        )
+        seed += 1
+    wall = time.perf_counter() - start
+
+    frames = profiler.frames
+    stage_means = profiler.averages()
+    return {
+        "scenario": scenario,
+        "mode": mode,
+        "size": list(game.HEADLESS_SIZE),
+        "frames": len(frames),
+        "sim_per_wall": round(len(frames) / game.physics_hz / wall, 1),
+        "frame_ms": _percentiles([f["frame"] for f in frames]),
+        "physics_ms": _percentiles([f.get("physics", 0) for f in frames]),
+        "draw_ms": _percentiles(
+            [sum(f.get(s, 0) for s in DRAW_STAGES) for f in frames if "sky" in f]
+        ),
+        "stage_mean_ms": {
+            stage: round(stage_means[stage] / 1e6, 4)
+            for stage, _ in STAGES
+            if stage in stage_means
+        },
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        "runs": runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pyhill benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("terrain", help="long-run physics step time")
+    p.add_argument("--km", type=int, default=50)
+    p.add_argument("--steps-per-km", type=int, default=200)
+    p.add_argument("--legacy", action="store_true", help="never retire chunks")
+
+    p = sub.add_parser("entities", help="dict vs slotted entity cost")
+    p.add_argument("--count", type=int, default=2000)
+    p.add_argument("--frames", type=int, default=300)
+
+    p = sub.add_parser("startup", help="time to the first menu frame")
+    p.add_argument("--blocking", action="store_true", help="load assets up front")
+    p.add_argument("--cold", action="store_true", help="start with no atlas cache")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+
+    p = sub.add_parser("store", help="JSON vs SQLite player store")
+    p.add_argument("--runs", type=int, default=100000)
+    p.add_argument("--players", type=int, default=1000)
+    p.add_argument("--record", type=int, default=500)
+
+    p = sub.add_parser("game", help="game loop scenarios")
+    p.add_argument(
+        "--scenario", action="append", choices=sorted(GAME_SCENARIOS), default=None
+    )
+    p.add_argument("--mode", choices=GAME_MODES + ("both",), default="both")
+    p.add_argument("--size", default="1920x1080", help="offscreen surface size")
+    p.add_argument("--out", help="also write the reports to this file")
+    p.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+    if args.bench == "terrain":
+        results = bench_terrain(args.km, args.steps_per_km, args.legacy)
+        for row in results:
+            print(json.dumps(row))
+    elif args.bench == "entities":
+        print(json.dumps(bench_entities(args.count, args.frames)))
+    elif args.bench == "startup":
+        if args.worker:
+            print(json.dumps(_startup_worker(not args.blocking, args.cold)))
+            return
+        print(json.dumps(bench_startup(not args.blocking, args.cold, args.repeat)))
+    elif args.bench == "store":
+        print(json.dumps(bench_store(args.runs, args.players, args.record)))
+    elif args.bench == "game":
+        size = tuple(int(v) for v in args.size.split("x"))
+        if args.worker:
+            print(json.dumps(bench_game(args.scenario[0], args.mode, size)))
+            return
+        scenarios = args.scenario or list(GAME_SCENARIOS)
+        modes = GAME_MODES if args.mode == "both" else (args.mode,)
+        reports = []
+        for scenario in scenarios:
+            for mode in modes:
+                # a fresh process per run keeps peak memory figures separate
+                out = subprocess.run(
+                    [sys.executable, __file__, "game", "--worker"]
+                    + ["--scenario", scenario, "--mode", mode, "--size", args.size],
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout
+                report = json.loads(out.strip().splitlines()[-1])
+                reports.append(report)
+                print(json.dumps(report))
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+class Collectibles:
+    """Coins or gas cans kept sorted by x, with a moving base offset.
+
+    Items are any objects with an `x`; their xs are mirrored in an array so
+    that window and "next ahead" queries are a bisect. drop_before() only
+    advances `base` past expired items and compacts the dead prefix once it
+    outgrows the live ones, the same way TrackStore trims track points.
+    """
+
+    def __init__(self):
+        self.xs = array("d")
+        self.items = []
+        self.base = 0
+
+    def __len__(self):
+        return len(self.items) - self.base
+
+    def __iter__(self):
+        return iter(self.items[self.base :])
+
+    def add(self, item):
+        x = item.x
+        if not self.xs or x >= self.xs[-1]:
+            self.xs.append(x)
+            self.items.append(item)
+        else:
+            i = bisect_right(self.xs, x, self.base)
+            self.xs.insert(i, x)
+            self.items.insert(i, item)
+
+    def window(self, x0, x1):
+        """Items with x0 <= x <= x1."""
+        lo = bisect_left(self.xs, x0, self.base)
+        hi = bisect_right(self.xs, x1, lo)
+        return self.items[lo:hi]
+
+    def first_after(self, x):
+        """The first item with an x beyond `x`, or None."""
+        i = bisect_right(self.xs, x, self.base)
+        return self.items[i] if i < len(self.items) else None
+
+    def drop_before(self, x):
+        """Forget every item with an x before `x`."""
+        xs = self.xs
+        base = self.base
+        end = len(xs)
+        while base < end and xs[base] < x:
+            base += 1
+        self.base = base
+        if base > end - base:
+            del xs[:base]
+            del self.items[:base]
+            self.base = 0
+
+    def clear(self):
+        del self.xs[:]
+        self.items.clear()
+        self.base = 0
@@ -0,0 +1,82 @@
+from lru import LRUCache
+
+ALPHA_STEPS = 32  # fade levels; set_alpha is only called when the level changes
+
+
+class FloatingText:
+    """One pooled floating label; `label` is the key of its cached surface."""
+
+    __slots__ = ("duration", "label", "timer", "x", "y")
+
+    def __init__(self):
+        self.label = None
+        self.x = 0.0
+        self.y = 0.0
+        self.timer = 0.0
+        self.duration = 1.0
+
+
+class FloatingTexts:
+    """Score popups that drift upward and fade out.
+
+    Each (text, colour) label is rendered once and kept in a small LRU;
+    popups are fixed FloatingText slots taken from a free list, so
+    spawning allocates nothing once the pool is warm. When all `capacity`
+    slots are busy the oldest popup is reused. Fading quantizes the alpha
+    to ALPHA_STEPS levels and sets it on the shared label surface right
+    before it is blitted.
+    """
+
+    def __init__(self, font, capacity=32, max_labels=64, rise=40):
+        self.font = font
+        self.rise = rise  # px per second
+        self.active = []
+        self.free = [FloatingText() for _ in range(capacity)]
+        self._labels = LRUCache(max_labels)  # label -> [surface, alpha set on it]
+
+    def __len__(self):
+        return len(self.active)
+
+    def spawn(self, text, x, y, duration=1.0, color=(0, 0, 0)):
+        if self.free:
+            ft = self.free.pop()
+        else:
+            ft = self.active.pop(0)  # pool exhausted: recycle the oldest
+        ft.label = (text, color)
+        ft.x = x
+        ft.y = y
+        ft.timer = ft.duration = duration
+        self.active.append(ft)
+
+    def _render(self, label):
+        text, color = label
+        return [self.font.render(text, True, color), 255]
+
+    def draw(self, surface, cam_x, cam_y):
+        for ft in self.active:
+            entry = self._labels.get(ft.label, self._render)
+            level = int(ALPHA_STEPS * ft.timer / ft.duration + 1)
+            alpha = min(255, level * 256 // ALPHA_STEPS)
+            if entry[1] != alpha:
+                entry[0].set_alpha(alpha)
+                entry[1] = alpha
+            surface.blit(entry[0], (ft.x - cam_x, ft.y - cam_y))
+
+    def update(self, dt):
+        """Age and raise every popup, returning expired ones to the pool."""
+        active = self.active
+        keep = 0
+        dy = self.rise * dt
+        for ft in active:
+            ft.timer -= dt
+            if ft.timer > 0:
+                ft.y -= dy
+                active[keep] = ft
+                keep += 1
+            else:
+                self.free.append(ft)
+        del active[keep:]
+
+    def clear(self):
+        self.free.extend(self.active)
+        self.active.clear()
@@ -0,0 +1,28 @@
+class Coin:
+    __slots__ = ("collected", "image", "value", "x", "y")
+
+    def __init__(self, x, y, value, image):
+        self.x = x
+        self.y = y
+        self.value = value
+        self.image = image
+        self.collected = False
+
+
+class GasCan:
+    __slots__ = ("collected", "x", "y")
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.collected = False
+
+
+class Cloud:
+    __slots__ = ("img", "speed", "x", "y")
+
+    def __init__(self, x, y, speed, img):
+        self.x = x
+        self.y = y
+        self.speed = speed
+        self.img = img
@@ -0,0 +1,108 @@
+import math
+
+import numpy as np
+
+# (amplitude, frequency, phase) of each sine octave; the original two-sine hills
+CLASSIC_OCTAVES = ((160, 0.0016, 0.0), (70, 0.004, 0.0))
+
+
+class Heightfield:
+    """Track heights generated in NumPy chunks and served from a lookup table.
+
+    The profile is a sum of sine octaves around `base`. Heights are
+    precomputed every `resolution` px, a chunk of `chunk_samples` at a time,
+    and track_y() linearly interpolates into that table, so no trig runs
+    per lookup. trim() drops the part of the table behind the car.
+    """
+
+    def __init__(
+        self, base=450, octaves=CLASSIC_OCTAVES, resolution=10, chunk_samples=2048
+    ):
+        self.base = base
+        self.octaves = tuple(tuple(o) for o in octaves)
+        self.resolution = resolution
+        self.chunk_samples = chunk_samples
+
+        self._amps = np.array([o[0] for o in self.octaves], dtype=float)
+        self._freqs = np.array([o[1] for o in self.octaves], dtype=float)
+        self._phases = np.array([o[2] for o in self.octaves], dtype=float)
+
+        self.x0 = 0
+        self.table = np.empty(0)
+        self._list = []  # same values as table, for fast scalar lookups
+
+    @classmethod
+    def seeded(
+        cls,
+        seed,
+        octaves=4,
+        base=450,
+        amplitude=160,
+        frequency=0.0016,
+        persistence=0.45,
+        lacunarity=2.4,
+        **kwargs,
+    ):
+        """Multi-octave profile with jittered frequencies and random phases."""
+        rng = np.random.default_rng(seed)
+        octs = []
+        amp, freq = amplitude, frequency
+        for _ in range(octaves):
+            octs.append(
+                (amp, freq * rng.uniform(0.8, 1.25), rng.uniform(0, 2 * math.pi))
+            )
+            amp *= persistence
+            freq *= lacunarity
+        return cls(base, octs, **kwargs)
+
+    def evaluate(self, xs):
+        """Exact heights at xs, computed directly from the octaves."""
+        xs = np.asarray(xs, dtype=float)
+        waves = np.sin(np.multiply.outer(xs, self._freqs) + self._phases)
+        return self.base + (self._amps * waves).sum(axis=-1)
+
+    @property
+    def end_x(self):
+        return self.x0 + (len(self._list) - 1) * self.resolution
+
+    def _extend(self):
+        start = self.x0 + len(self._list) * self.resolution
+        xs = start + np.arange(self.chunk_samples) * self.resolution
+        ys = self.evaluate(xs)
+        self.table = np.concatenate((self.table, ys))
+        self._list.extend(ys.tolist())
+
+    def ensure(self, x):
+        """Generate table chunks until x can be interpolated."""
+        while self.end_x < x + self.resolution:
+            self._extend()
+
+    def trim(self, x):
+        """Drop table samples that lie before x."""
+        k = int((x - self.x0) // self.resolution) - 1
+        if k > 0:
+            k = min(k, len(self._list) - 2)
+            self.table = self.table[k:].copy()
+            del self._list[:k]
+            self.x0 += k * self.resolution
+
+    def track_y(self, x):
+        f = (x - self.x0) / self.resolution
+        if f < 0:
+            return float(self.evaluate(x))
+        i = int(f)
+        if i + 1 >= len(self._list):
+            self.ensure(x)
+        a = self._list[i]
+        return a + (self._list[i + 1] - a) * (f - i)
+
+    def heights(self, xs):
+        """Vectorised track_y for an array of xs."""
+        xs = np.asarray(xs, dtype=float)
+        if xs.min() < self.x0:
+            return self.evaluate(xs)
+        self.ensure(xs.max())
+        f = (xs - self.x0) / self.resolution
+        i = f.astype(np.intp)
+        a = self.table[i]
+        return a + (self.table[i + 1] - a) * (f - i)
@@ -0,0 +1,39 @@
+from bisect import bisect_right
+
+
+class TopRuns:
+    """The `capacity` best runs by one key, kept sorted as runs arrive.
+
+    add() is a bisect and a list insert, so recording a run never
+    re-sorts the history. Runs with equal scores stay in arrival order,
+    the same order SQLite's `ORDER BY key DESC, id` gives.
+    """
+
+    def __init__(self, capacity=1000, key="distance"):
+        self.capacity = capacity
+        self.key = key
+        self.scores = []  # negated, so the list ascends
+        self.runs = []
+
+    def __len__(self):
+        return len(self.runs)
+
+    def add(self, run):
+        """Insert `run`; returns its rank, or None if it didn't make the list."""
+        score = -run[self.key]
+        i = bisect_right(self.scores, score)
+        if i >= self.capacity:
+            return None
+        self.scores.insert(i, score)
+        self.runs.insert(i, run)
+        if len(self.runs) > self.capacity:
+            self.scores.pop()
+            self.runs.pop()
+        return i
+
+    def extend(self, runs):
+        for run in runs:
+            self.add(run)
+
+    def page(self, offset, limit):
+        return self.runs[offset : offset + limit]
@@ -0,0 +1,37 @@
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Values made once per key, the least recently used dropped beyond max_items.
+
+    get() calls make(key) only the first time a key is asked for, so
+    callers keep just the recipe for a value (a rendered label, a table
+    row, a baked chunk) and never their own eviction bookkeeping.
+    """
+
+    def __init__(self, max_items=128):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, make):
+        value = self._items.get(key)
+        if value is None:
+            self.misses += 1
+            value = self._items[key] = make(key)
+            if len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        else:
+            self.hits += 1
+            self._items.move_to_end(key)
+        return value
+
+    def clear(self):
+        self._items.clear()
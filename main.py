@@ -1,25 +1,55 @@
+import argparse
 import json
 import math
 import os
 import random
 import sys
+import threading
+import time
 from datetime import datetime
 
 import pygame
 import pymunk
 
-PLAYERS_FILE = os.path.join(os.path.expanduser("~"), "pyhill_players.json")
+from assets import load_atlas
+from collectibles import Collectibles
+from effects import FloatingTexts
+from entities import Coin, GasCan
+from heightfield import Heightfield
+from lru import LRUCache
+from profiler import FrameProfiler
+from replay import Recording, ReplayControls, load_recording, save_recording
+from sky import Sky
+from sprites import RotationCache
+from store import PlayerStore, SqlitePlayerStore
+from terrain import Terrain, TerrainRenderer, draw_terrain_segments
+from textcache import DIGITS, TextCache
 
-pygame.init()
-screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-WIDTH, HEIGHT = screen.get_size()
+PLAYERS_FILE = os.path.join(os.path.expanduser("~"), "pyhill_players.json")
+RUNS_FILE = os.path.join(os.path.expanduser("~"), "pyhill_runs.jsonl")
+PLAYERS_DB = os.path.join(os.path.expanduser("~"), "pyhill_players.db")
+ASSET_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pyhill")
+
+# headless runs use the SDL dummy driver, skip convert() and never draw
+HEADLESS = os.environ.get("PYHILL_HEADLESS") == "1"
+HEADLESS_SIZE = (1920, 1080)
+
+screen = None  # what everything draws on: the window, or world_surface in a run
+display = None  # the window surface
+world_surface = None  # internal-resolution target for runs below native size
+WIDTH, HEIGHT = HEADLESS_SIZE
+render_scale = 1.0  # internal resolution as a fraction of the native one
+render_size = None  # or a fixed internal (width, height), overriding render_scale
+native_hud = False  # draw the in-game HUD at native resolution over the scaled world
+assets_ready = threading.Event()  # set once load_assets has run
+asset_error = None
 clock = pygame.time.Clock()
-pygame.display.set_caption("Pyhill")
-coin_icon = pygame.image.load("assets/coin_icon.png").convert_alpha()
-gas_icon = pygame.image.load("assets/gas_icon.png").convert_alpha()
-gas_icon_ui = pygame.transform.rotozoom(gas_icon, 0, 0.8)
+coin_icon = None
+gas_icon = None
+gas_icon_ui = None
 cloud_files = ["assets/cloud1.png", "assets/cloud2.png", "assets/cloud3.png"]
-cloud_images = [pygame.image.load(f).convert_alpha() for f in cloud_files]
+CLOUD_SCALES = (0.25, 0.32, 0.39, 0.46, 0.53, 0.6)  # every cloud size, pre-scaled
+cloud_variants = []  # (scale, image) for each cloud file and scale
 
 LEMONMILK_REG = "assets/LEMONMILK-Regular.otf"
 LEMONMILK_BOLD = "assets/LEMONMILK-Bold.otf"
@@ -32,64 +62,157 @@ COIN_TYPES = [
     {"value": 500, "icon": "assets/coin_500.png"},
 ]
 
-# load and scale once
-for ctype in COIN_TYPES:
-    img = pygame.image.load(ctype["icon"]).convert_alpha()
-    ctype["image"] = pygame.transform.rotozoom(img, 0, 1.5)
 
+def init_display(headless=HEADLESS, background=False):
+    """Open the window, or an offscreen surface when headless, and load assets.
+
+    The window is always native, so the menus keep the layout their
+    pixel positions were made for. Below native resolution (render_scale
+    < 1 or a render_size) runs draw into world_surface at the internal
+    size, which is scaled onto the window in one blit per frame; the HUD
+    goes on before that blit, or after it at full size with native_hud.
 
-def reset_game_state():
-    global space, track_pts, track_x, coins, gas_cans, next_coin_x
+    With background the assets load on a thread and this returns as soon
+    as the screen is up, so the menu can show straight away; anything
+    that needs the images calls wait_for_assets() first.
+    """
+    global HEADLESS, display, world_surface
+    HEADLESS = headless
+    if headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    pygame.init()
+    world_surface = None
+    if headless:
+        display = pygame.Surface(HEADLESS_SIZE)
+    else:
+        native = pygame.display.get_desktop_sizes()[0]
+        size = render_size or (
+            round(native[0] * render_scale),
+            round(native[1] * render_scale),
+        )
+        display = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        if tuple(size) != display.get_size():
+            world_surface = pygame.Surface(size).convert()
+        pygame.display.set_caption("Pyhill")
+    set_render_target(display)
+    assets_ready.clear()
+    if background:
+        threading.Thread(target=_load_assets_thread, name="assets", daemon=True).start()
+    else:
+        _load_assets_thread()
+        wait_for_assets()
+
+
+def set_render_target(surface):
+    """Make `surface` the screen everything draws on, and its size WIDTH/HEIGHT."""
+    global screen, WIDTH, HEIGHT
+    screen = surface
+    WIDTH, HEIGHT = surface.get_size()
+
+
+def _load_assets_thread():
+    global asset_error
+    asset_error = None
+    try:
+        load_assets()
+    except Exception as exc:  # re-raised on the main thread by wait_for_assets
+        asset_error = exc
+    finally:
+        assets_ready.set()
+
+
+def wait_for_assets():
+    """Block until load_assets has finished, re-raising anything it raised."""
+    assets_ready.wait()
+    if asset_error is not None:
+        raise asset_error
+
+
+def load_image(path, alpha=True):
+    img = pygame.image.load(path)
+    if HEADLESS:
+        return img
+    return img.convert_alpha() if alpha else img.convert()
+
+
+def atlas_entries():
+    """(name, path, scale) of every image packed into the sprite atlas."""
+    entries = [
+        ("coin_icon", "assets/coin_icon.png", 1),
+        ("gas_icon", "assets/gas_icon.png", 1),
+        ("gas_icon_ui", "assets/gas_icon.png", 0.8),
+    ]
+    entries += [
+        (f"cloud{i}@{scale}", path, scale)
+        for i, path in enumerate(cloud_files)
+        for scale in CLOUD_SCALES
+    ]
+    entries += [(f"coin{c['value']}", c["icon"], 1.5) for c in COIN_TYPES]
+    entries += [(f"car{i}", path, 1) for i, path in enumerate(car_files)]
+    entries += [(f"car{i}_game", path, car_scale) for i, path in enumerate(car_files)]
+    return entries
+
+
+def load_assets():
+    global coin_icon, gas_icon, gas_icon_ui, cloud_variants, car_images, car_game_images
+    global dirt_tex, grass_tex, terrain_renderer
+
+    # sprites come pre-scaled from one atlas texture, cached on disk
+    atlas = load_atlas(atlas_entries(), ASSET_CACHE_DIR, convert=not HEADLESS)
+    coin_icon = atlas["coin_icon"]
+    gas_icon = atlas["gas_icon"]
+    gas_icon_ui = atlas["gas_icon_ui"]
+    cloud_variants = [
+        (scale, atlas[f"cloud{i}@{scale}"])
+        for i in range(len(cloud_files))
+        for scale in CLOUD_SCALES
+    ]
+    for ctype in COIN_TYPES:
+        ctype["image"] = atlas[f"coin{ctype['value']}"]
+    car_images = [atlas[f"car{i}"] for i in range(len(car_files))]
+    car_game_images = [atlas[f"car{i}_game"] for i in range(len(car_files))]
+
+    dirt_tex = load_image("assets/dirt_tile.png", alpha=False)
+    grass_tex = load_image("assets/grass_top.png")
+    terrain_renderer = TerrainRenderer(dirt_tex, grass_tex)
+
+
+def reset_game_state(seed=None):
+    global space, heightfield, terrain, coins, gas_cans, next_coin_x
+    global run_seed, rng, sky_rng, input_log
     global fuel, distance_traveled, coin_score, game_time
     global out_of_gas_time, upside_down_start, engine_disabled
-    global cam_x, cam_y, y_base, amp1, amp2, freq1, freq2, buffer_ahead, buffer_behind
-    global \
-        coin_spacing_min, \
-        coin_spacing_max, \
-        min_gas_distance, \
-        smart_spawn_distance, \
-        flip_count
-    global clouds
+    global cam_x, cam_y, flip_count
+    global sky, floating_texts
+
+    # ===== RANDOMNESS =====
+    # gameplay and sky draw from separate streams so that skipping the
+    # (visual-only) clouds in headless runs doesn't change the run
+    if seed is None:
+        seed = random.randrange(2**32)
+    run_seed = seed
+    rng = random.Random(seed)
+    sky_rng = random.Random(seed + 1)
+    input_log = bytearray()  # one INPUT_* bitmask per tick
 
     # ===== PHYSICS =====
     space = pymunk.Space()
-    space.gravity = (0, 500)
+    space.gravity = gravity
 
     # ===== TRACK =====
-    track_pts = []
-    track_step = 30
-    track_x = 0
-    buffer_ahead = 6000
-    buffer_behind = 2000
-    y_base = 450
-    amp1, amp2 = 160, 70
-    freq1, freq2 = 0.0016, 0.004
-
-    def track_y(x):
-        return y_base + amp1 * math.sin(x * freq1) + amp2 * math.sin(x * freq2)
-
-    globals()["track_y"] = track_y  # rebind function globally for reuse
-
-    def add_track_point(x):
-        y = track_y(x)
-        track_pts.append((x, y))
-        if len(track_pts) > 1:
-            seg = pymunk.Segment(space.static_body, track_pts[-2], track_pts[-1], 4)
-            seg.friction = 1.0
-            seg.elasticity = 0.1
-            space.add(seg)
-
-    globals()["add_track_point"] = add_track_point
-
-    for _ in range(buffer_ahead // track_step):
-        add_track_point(track_x)
-        track_x += track_step
+    # track and spawn tuning lives at module level so runs can be configured
+    heightfield = make_heightfield()
+    terrain = Terrain(space, heightfield, step=track_step)
+    terrain.extend_to(buffer_ahead)
+    terrain_renderer.clear()
+    if floating_texts is None:
+        floating_texts = FloatingTexts(get_font(LEMONMILK_BOLD, 42))
+    floating_texts.clear()
 
     # ===== COINS & GAS =====
-    coins = []
-    gas_cans = []
-    coin_spacing_min = 1000
-    coin_spacing_max = 1600
+    coins = Collectibles()
+    gas_cans = Collectibles()
     next_coin_x = 800
 
     # ===== GAME STATS =====
@@ -103,57 +226,116 @@ def reset_game_state():
 
     # ===== CAMERA =====
     cam_x, cam_y = 0, 0
-    smart_spawn_distance = 1000
-    min_gas_distance = 2500
     flip_count = 0
 
-    # spawn clouds
-    clouds = []
-    for i in range(8):  # more clouds = better spread
-        img = random.choice(cloud_images)
-        scale = random.uniform(0.25, 0.6)  # smaller clouds
-        cloud_img_scaled = pygame.transform.rotozoom(img, 0, scale)
-
-        # spread clouds far across the sky
-        x = random.randint(0, WIDTH * 4)
-        y = random.randint(40, 260)
-
-        speed = random.uniform(0.1, 0.35)  # slower = more natural
-        clouds.append({"x": x, "y": y, "speed": speed, "img": cloud_img_scaled})
+    # clouds are recycled across runs; only a new sky config rebuilds them
+    config = (WIDTH, len(sky.layers), sky.density) if sky is not None else None
+    if config != (WIDTH, cloud_layers, cloud_density):
+        sky = Sky(cloud_variants, WIDTH, cloud_layers, cloud_density)
+    sky.reset(sky_rng)
 
 
 def load_players():
-    if os.path.exists(PLAYERS_FILE):
-        try:
-            with open(PLAYERS_FILE, "r") as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+    """Players' bests from the configured store_backend.
+
+    The first SQLite launch imports the JSON summary and run log, which
+    are left in place. Writes go to a background thread, so recording a
+    run never waits on the disk; quit_game() flushes them.
+    """
+    global player_store
+    if store_backend == "sqlite":
+        player_store = SqlitePlayerStore(
+            PLAYERS_DB, background=True, fsync=persist_fsync
+        )
+        legacy = None
+        if os.path.exists(PLAYERS_FILE) or os.path.exists(RUNS_FILE):
+            legacy = PlayerStore(PLAYERS_FILE, RUNS_FILE)
+        return player_store.load(legacy)
+    player_store = PlayerStore(
+        PLAYERS_FILE, RUNS_FILE, background=True, fsync=persist_fsync
+    )
+    return player_store.load()
 
 
-def save_players(players):
-    with open(PLAYERS_FILE, "w") as f:
-        json.dump(players, f, indent=2)
+def quit_game():
+    """Flush pending saves and exit; every way out of the game goes through here."""
+    try:
+        if player_store is not None:
+            player_store.close()
+    finally:
+        pygame.quit()
+    sys.exit()
 
 
 # ===== PHYSICS =====
-space = pymunk.Space()
-space.gravity = (0, 500)
+space = None
 
 # ===== LOAD CARS =====
 car_files = ["assets/car1.png", "assets/car2.png", "assets/car3.png", "assets/car4.png"]
-car_images = [pygame.image.load(f).convert_alpha() for f in car_files]
+car_images = []
+car_game_images = []  # car_images at car_scale, as driven
 selected_car_index = 0  # which car player picked
+player_car = None  # pymunk body of the car in the current run
+car_scale = 0.4
+car_rotation_step = 2  # degrees between the car's pre-rotated sprites
+car_rotation_budget_mb = 32
+car_sprites = (None, None)  # (car index, RotationCache) of the selected car
+show_profiler = False  # F3 toggles the frame profiler overlay
+profile_log = None  # file receiving one JSON line of stage timings per frame
+run_seed = None
+rng = random.Random()  # gameplay randomness, reseeded every run
+sky_rng = random.Random()  # clouds only
+input_log = bytearray()
 
 # ===== TEXTURES =====
-dirt_tex = pygame.image.load("assets/dirt_tile.png").convert()
-grass_tex = pygame.image.load("assets/grass_top.png").convert_alpha()
+dirt_tex = None
+grass_tex = None
+terrain_renderer = None
+bake_terrain = True  # False draws every segment per frame (reference path)
+
+# ===== TEXT =====
+text_cache = TextCache()
+_fonts = {}
+
+
+def get_font(path, size):
+    """One Font per file and size, so cached text stays keyed to it."""
+    f = _fonts.get((path, size))
+    if f is None:
+        f = _fonts[path, size] = pygame.font.Font(path, size)
+    return f
+
+
+def render_text(font, text, color):
+    return text_cache.render(font, text, color)
 
 
 # ===== FUNCTIONS =====
-def create_car(selected_car_img):
-    car_img = pygame.transform.rotozoom(selected_car_img, 0, 0.4)
+def car_rotations(index):
+    """The selected car's RotationCache, rebuilt when the car changes."""
+    global car_sprites
+    if car_sprites[0] != index:
+        cache = RotationCache(
+            car_game_images[index], car_rotation_step, car_rotation_budget_mb
+        )
+        car_sprites = (index, cache)
+    return car_sprites[1]
+
+
+hud_images = {}  # (name, scale) -> HUD icon scaled for a native-resolution HUD
+
+
+def hud_image(name, image, scale):
+    """`image` scaled by `scale`, made once per session."""
+    if scale == 1:
+        return image
+    key = (name, scale)
+    if key not in hud_images:
+        hud_images[key] = pygame.transform.smoothscale_by(image, scale)
+    return hud_images[key]
+
+
+def create_car(car_img):
     car_w, car_h = car_img.get_size()
     mass = 8
     collision_h = car_h * 0.55
@@ -166,61 +348,61 @@ def create_car(selected_car_img):
     return car_img, car_body, car_shape, car_w, car_h
 
 
+gravity = (0, 500)
+physics_hz = 60  # fixed simulation tick rate
+physics_substeps = 1  # space.step calls per tick
+max_fps = 120  # render cap; 0 for uncapped
+max_frame_dt = 0.25  # longest real frame simulated, avoids a spiral of death
+
 # ===== TRACK =====
-track_pts = []
 track_step = 30
-track_x = 0
 buffer_ahead = 6000
 buffer_behind = 2000
 y_base = 450
 amp1, amp2 = 160, 70
 freq1, freq2 = 0.0016, 0.004
+terrain_seed = None  # set to an int for a seeded multi-octave profile
 
 
-def track_y(x):
-    return y_base + amp1 * math.sin(x * freq1) + amp2 * math.sin(x * freq2)
+def make_heightfield():
+    if terrain_seed is None:
+        return Heightfield(y_base, ((amp1, freq1, 0.0), (amp2, freq2, 0.0)))
+    return Heightfield.seeded(terrain_seed, base=y_base)
 
 
-def add_track_point(x):
-    y = track_y(x)
-    track_pts.append((x, y))
-    if len(track_pts) > 1:
-        seg = pymunk.Segment(space.static_body, track_pts[-2], track_pts[-1], 4)
-        seg.friction = 1.0
-        seg.elasticity = 0.1
-        space.add(seg)
+def track_y(x):
+    return heightfield.track_y(x)
 
 
-for _ in range(buffer_ahead // track_step):
-    add_track_point(track_x)
-    track_x += track_step
+heightfield = None
+terrain = None
 
 # ===== COINS & GAS =====
-coins = []
+coins = Collectibles()  # sorted by x
 coin_spacing_min = 1000
 coin_spacing_max = 1600
 next_coin_x = 800
 coin_radius = 18
 
-gas_cans = []
+gas_cans = Collectibles()
 gas_radius = 20
 gas_refill_amount = 100
 game_time = 0
 last_spawn_x = 0
 
-font = pygame.font.Font(LEMONMILK_BOLD, 24)
-collect_font = pygame.font.Font(LEMONMILK_BOLD, 42)
+floating_texts = None  # FloatingTexts pool, shared by every run
 flip_timer = 0
 speed_limit = 12000
 accel_force = 11000
+air_spin_rate = 9.0  # rad/s of spin added per second of steering in the air
 distance_traveled = 0
 PPM = 30
 cam_x, cam_y = 0, 0
 cam_smooth = 0.1
 coin_score = 0
 fuel = 100
-fuel_deplete_rate = 0.05
-fuel_accel_drain = 0.2
+fuel_deplete_rate = 3.0  # per second
+fuel_accel_drain = 12.0  # per second of throttle
 fuel_bar_width = 400
 out_of_gas_time = None
 low_fuel_threshold = 30
@@ -229,64 +411,179 @@ min_gas_distance = 2500
 upside_down_start = None
 engine_disabled = False
 flip_count = 0
-clouds = []
+sky = None  # Sky of the current session, see reset_game_state
+cloud_layers = 1  # parallax depths of clouds
+cloud_density = 2.0  # clouds per screen width, in each layer
 
 
 def spawn_coin_group(x_start):
-    group_size = random.randint(2, 6)
+    group_size = rng.randint(2, 6)
     gap = 80
     for i in range(group_size):
         x = x_start + i * gap
         y = track_y(x) - 60
 
-        coin_type = random.choices(
+        coin_type = rng.choices(
             COIN_TYPES,
             weights=[60, 25, 10, 4, 1],  # bronze common, diamond rare
             k=1,
         )[0]
 
-        coins.append(
-            {
-                "x": x,
-                "y": y,
-                "collected": False,
-                "value": coin_type["value"],
-                "image": coin_type["image"],
-            }
-        )
+        coins.add(Coin(x, y, coin_type["value"], coin_type["image"]))
 
 
 def spawn_gas_can(x_start):
     y = track_y(x_start) - 100
-    gas_cans.append({"x": x_start, "y": y, "collected": False})
-
+    gas_cans.add(GasCan(x_start, y))
 
-spawn_coin_group(next_coin_x)
-spawn_gas_can(2500)
 
-players = load_players()
+players = {}  # loaded at startup, see load_players
+player_store = None  # PlayerStore or SqlitePlayerStore behind players
+store_backend = "json"  # "sqlite" keeps players and runs in PLAYERS_DB
+persist_fsync = "always"  # or "summary"/"never", see store.FSYNC_POLICIES
 current_player = None
 
 
+# ===== MENU HELPERS =====
+MENU_IDLE_MS = 1000  # longest a menu sleeps in event.wait with nothing to animate
+TITLE_FRAME_MS = 33  # main menu title animation tick
+
+
+def wait_events(timeout=MENU_IDLE_MS):
+    """Sleep until input arrives or `timeout` ms pass; return every pending event."""
+    first = pygame.event.wait(timeout)
+    if first.type == pygame.NOEVENT:
+        return []
+    return [first] + pygame.event.get()
+
+
+def menu_background(color):
+    """A screen-sized surface to draw a menu's static parts on once."""
+    bg = screen.copy()
+    bg.fill(color)
+    return bg
+
+
+class Button:
+    """A menu button whose idle and hovered looks are rendered once.
+
+    hover() tracks the mouse and reports when the look changes, so a menu
+    only has to repaint (and update) the buttons whose state flipped.
+    """
+
+    def __init__(
+        self, rect, text, font, color_idle, color_hover=None, border=3, radius=12
+    ):
+        self.rect = pygame.Rect(rect)
+        self.text = text
+        self.hovered = False
+        self.looks = (
+            self._render(font, color_idle, border, radius),
+            self._render(font, color_hover or color_idle, border, radius),
+        )
+
+    def _render(self, font, color, border, radius):
+        surf = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        box = surf.get_rect()
+        pygame.draw.rect(surf, color, box, border_radius=radius)
+        if border:
+            pygame.draw.rect(surf, (0, 0, 0), box, border, border_radius=radius)
+        label = render_text(font, self.text, (0, 0, 0))
+        surf.blit(
+            label,
+            (
+                box.centerx - label.get_width() // 2,
+                box.centery - label.get_height() // 2,
+            ),
+        )
+        return surf
+
+    def hover(self, pos):
+        hovered = self.rect.collidepoint(pos)
+        changed = hovered != self.hovered
+        self.hovered = hovered
+        return changed
+
+    def draw(self, surface, background=None):
+        """Paint the button, over `background` if given, and return its rect."""
+        if background is not None:
+            surface.blit(background, self.rect, self.rect)
+        surface.blit(self.looks[self.hovered], self.rect)
+        return self.rect
+
+
+def repaint_hovered(buttons, pos, background):
+    """Repaint the buttons whose hover state changed; returns their rects."""
+    return [b.draw(screen, background) for b in buttons if b.hover(pos)]
+
+
 # ===== CAR SELECTION MENU =====
+CAROUSEL_STEPS = 6  # cached sizes from a side car (0) to the selected car
+CAROUSEL_FRAME_MS = 16
+CAROUSEL_HALF_LIFE_MS = 40
+car_previews = {}  # (car index, step) -> scaled image, kept between visits
+
+
+def car_preview(index, step):
+    """Car `index` scaled `step` CAROUSEL_STEPS of the way to the selected size."""
+    img = car_previews.get((index, step))
+    if img is None:
+        scale = 0.35 + (0.6 - 0.35) * step / CAROUSEL_STEPS
+        img = pygame.transform.rotozoom(car_images[index], 0, scale)
+        car_previews[index, step] = img
+    return img
+
+
 def car_selection_menu():
     global selected_car_index
-    menu_font = pygame.font.Font(LEMONMILK_BOLD, 48)
-    small_font = pygame.font.Font(LEMONMILK_BOLD, 24)
-    title_text = menu_font.render("SELECT YOUR RIDE", True, (255, 215, 0))
+    wait_for_assets()
+    menu_font = get_font(LEMONMILK_BOLD, 48)
+    small_font = get_font(LEMONMILK_BOLD, 24)
+
+    background = menu_background((25, 25, 35))
+    title_text = render_text(menu_font, "SELECT YOUR RIDE", (255, 215, 0))
+    background.blit(title_text, (WIDTH // 2 - title_text.get_width() // 2, HEIGHT // 6))
+    hint_text = render_text(
+        small_font, "← → to select  |  ENTER to confirm", (220, 220, 220)
+    )
+    background.blit(hint_text, (WIDTH // 2 - hint_text.get_width() // 2, HEIGHT - 100))
+
+    # the cars occupy one horizontal strip; it is all a transition repaints
+    center_y = HEIGHT // 2 + 50
+    strip_h = max(
+        car_preview(i, CAROUSEL_STEPS).get_height() for i in range(len(car_images))
+    )
+    strip = pygame.Rect(0, center_y - strip_h // 2, WIDTH, strip_h)
+    shown = float(selected_car_index)  # carousel position, eases toward the selection
+
+    def draw_cars():
+        screen.blit(background, strip, strip)
+        for i in range(len(car_images)):
+            closeness = max(0.0, 1 - abs(i - shown))
+            car_display = car_preview(i, round(closeness * CAROUSEL_STEPS))
+            rect = car_display.get_rect(
+                center=(WIDTH // 2 + (i - shown) * 300, center_y)
+            )
+            screen.blit(car_display, rect)
+        return strip
 
+    def draw():
+        screen.blit(background, (0, 0))
+        draw_cars()
+        pygame.display.flip()
+
+    draw()
+    last = pygame.time.get_ticks()
     waiting = True
     while waiting:
-        screen.fill((25, 25, 35))
-
-        # handle events
-        for e in pygame.event.get():
+        # sleep until input unless the carousel is still moving
+        moving = shown != selected_car_index
+        for e in wait_events(CAROUSEL_FRAME_MS if moving else MENU_IDLE_MS):
             if e.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+                quit_game()
             if e.type == pygame.KEYDOWN:
                 if e.key == pygame.K_ESCAPE:
-                    return  # back to main menu
+                    return "menu"
                 elif e.key == pygame.K_LEFT:
                     selected_car_index = (selected_car_index - 1) % len(car_images)
                 elif e.key == pygame.K_RIGHT:
@@ -305,512 +602,475 @@ def car_selection_menu():
                     if rect.collidepoint(mx, my):
                         selected_car_index = i
                         waiting = False
-
-        # draw title
-        screen.blit(title_text, (WIDTH // 2 - title_text.get_width() // 2, HEIGHT // 6))
-
-        # draw cars
-        for i, img in enumerate(car_images):
-            scale = 0.6 if i == selected_car_index else 0.35
-            car_display = pygame.transform.rotozoom(img, 0, scale)
-            rect = car_display.get_rect(
-                center=(
-                    WIDTH // 2 + (i - selected_car_index) * 300,
-                    HEIGHT // 2 + 50,
-                )
+        now = pygame.time.get_ticks()
+        if waiting and shown != selected_car_index:
+            # ease out: the gap halves every CAROUSEL_HALF_LIFE_MS; a step
+            # spans at most one frame, so an idle wait before the keypress
+            # doesn't snap the carousel straight to the selection
+            dt = min(now - last, CAROUSEL_FRAME_MS)
+            shown += (selected_car_index - shown) * (
+                1 - 0.5 ** (dt / CAROUSEL_HALF_LIFE_MS)
             )
-            screen.blit(car_display, rect)
+            if abs(selected_car_index - shown) < 0.01:
+                shown = float(selected_car_index)
+            pygame.display.update(draw_cars())
+        last = now
 
-        hint_text = small_font.render(
-            "← → to select  |  ENTER to confirm", True, (220, 220, 220)
-        )
-        screen.blit(hint_text, (WIDTH // 2 - hint_text.get_width() // 2, HEIGHT - 100))
-
-        pygame.display.flip()
-        clock.tick(30)
+    # rotate the chosen car now rather than during the first seconds of play
+    car_rotations(selected_car_index).prebuild()
+    return "menu"
 
 
 # ===== MAIN MENU =====
 def main_menu():
     global current_player, players
 
-    menu_font = pygame.font.Font(LEMONMILK_BOLD, 164)
-    small_font = pygame.font.Font(LEMONMILK_BOLD, 32)
-    tiny_font = pygame.font.Font(LEMONMILK_BOLD, 24)
-
-    title_text = menu_font.render("PYHILL", True, (255, 215, 0))
+    menu_font = get_font(LEMONMILK_BOLD, 164)
+    small_font = get_font(LEMONMILK_BOLD, 32)
+    tiny_font = get_font(LEMONMILK_BOLD, 24)
+
+    title_text = render_text(menu_font, "PYHILL", (255, 215, 0))
+    # the title bobs 30px either way; this band is all the animation touches
+    title_band = pygame.Rect(
+        WIDTH // 2 - title_text.get_width() // 2,
+        HEIGHT // 8 - 30,
+        title_text.get_width(),
+        title_text.get_height() + 61,
+    )
 
     button_w, button_h = 320, 90
-    start_btn_rect = pygame.Rect(
-        WIDTH - button_w - 60, HEIGHT - button_h - 60, button_w, button_h
+    start_btn = Button(
+        (WIDTH - button_w - 60, HEIGHT - button_h - 60, button_w, button_h),
+        "START",
+        small_font,
+        (0, 220, 0),
+        (0, 255, 0),
     )
-    car_btn_rect = pygame.Rect(
-        WIDTH // 2 - button_w // 2, HEIGHT // 2, button_w, button_h
+    car_btn = Button(
+        (WIDTH // 2 - button_w // 2, HEIGHT // 2, button_w, button_h),
+        "SELECT CAR",
+        small_font,
+        (255, 230, 120),
+        (255, 255, 180),
     )
-    score_btn_rect = pygame.Rect(
-        WIDTH // 2 - button_w // 2, HEIGHT // 2 + 120, button_w, button_h
+    score_btn = Button(
+        (WIDTH // 2 - button_w // 2, HEIGHT // 2 + 120, button_w, button_h),
+        "LEADERBOARDS",
+        small_font,
+        (120, 180, 255),
+        (160, 210, 255),
+    )
+    exit_btn = Button(
+        (40, HEIGHT - 100, 220, 70), "EXIT", small_font, (180, 80, 80), (255, 100, 100)
     )
-    exit_btn_rect = pygame.Rect(40, HEIGHT - 100, 220, 70)
-
-    waiting = True
-    while waiting:
-        screen.fill((20, 20, 30))
-        wave = math.sin(pygame.time.get_ticks() * 0.002) * 30
-
-        # Title
-        screen.blit(
-            title_text, (WIDTH // 2 - title_text.get_width() // 2, HEIGHT // 8 + wave)
-        )
-
-        mx, my = pygame.mouse.get_pos()
-        clicked = False
-
-        for e in pygame.event.get():
-            if e.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if e.type == pygame.KEYDOWN and e.key in (pygame.K_RETURN, pygame.K_SPACE):
-                pygame.event.clear()
-                waiting = False
-            if e.type == pygame.MOUSEBUTTONDOWN and e.button == 1:
-                clicked = True
-
-        # Button drawing helper
-        def draw_button(rect, text, color_idle, color_hover, font):
-            hovered = rect.collidepoint(mx, my)
-            color = color_hover if hovered else color_idle
-            pygame.draw.rect(screen, color, rect, border_radius=12)
-            pygame.draw.rect(screen, (0, 0, 0), rect, 3, border_radius=12)
-            label = font.render(text, True, (0, 0, 0))
-            screen.blit(
-                label,
-                (
-                    rect.centerx - label.get_width() // 2,
-                    rect.centery - label.get_height() // 2,
-                ),
-            )
-            return hovered
 
-        # ===== Buttons =====
-        if (
-            draw_button(start_btn_rect, "START", (0, 220, 0), (0, 255, 0), small_font)
-            and clicked
-        ):
-            if current_player:
-                waiting = False
-        if (
-            draw_button(
-                car_btn_rect, "SELECT CAR", (255, 230, 120), (255, 255, 180), small_font
-            )
-            and clicked
-        ):
-            car_selection_menu()
-        if (
-            draw_button(
-                score_btn_rect,
-                "LEADERBOARDS",
-                (120, 180, 255),
-                (160, 210, 255),
-                small_font,
-            )
-            and clicked
-        ):
-            LEADERBOARDS()
-        if (
-            draw_button(
-                exit_btn_rect, "EXIT", (180, 80, 80), (255, 100, 100), small_font
-            )
-            and clicked
-        ):
-            pygame.quit()
-            sys.exit()
+    # Tall box
+    player_box_rect = pygame.Rect(WIDTH - 360, 40, 320, 290)
 
-        # ===== PLAYER BOX =====
+    def build():
+        """Background with the player box, plus the buttons for the current player."""
+        bg = menu_background((20, 20, 30))
         if current_player:
-            # Tall box
-            player_box_rect = pygame.Rect(WIDTH - 360, 40, 320, 290)
-            pygame.draw.rect(screen, (60, 60, 80), player_box_rect, border_radius=12)
+            pygame.draw.rect(bg, (60, 60, 80), player_box_rect, border_radius=12)
 
             # Texts stacked vertically
-            name_text = tiny_font.render(
-                f"Player: {current_player}", True, (255, 230, 120)
-            )
             stats = players[current_player]
-            coins_text = tiny_font.render(
-                f"Coins: {stats['Coins']}", True, (220, 220, 220)
-            )
-            flips_text = tiny_font.render(
-                f"Flips: {stats['Flips']}", True, (220, 220, 220)
-            )
-            dist_text = tiny_font.render(
-                f"Dist: {stats['Max Distance']}", True, (220, 220, 220)
-            )
+            lines = [
+                (f"Player: {current_player}", (255, 230, 120)),
+                (f"Coins: {stats['Coins']}", (220, 220, 220)),
+                (f"Flips: {stats['Flips']}", (220, 220, 220)),
+                (f"Dist: {stats['Max Distance']}", (220, 220, 220)),
+            ]
 
             # Vertical layout
             spacing = 45
             x = player_box_rect.x + 20
             y = player_box_rect.y + 20
-            screen.blit(name_text, (x, y))
-            screen.blit(coins_text, (x, y + spacing))
-            screen.blit(flips_text, (x, y + spacing * 2))
-            screen.blit(dist_text, (x, y + spacing * 3))
+            for i, (text, color) in enumerate(lines):
+                bg.blit(render_text(tiny_font, text, color), (x, y + spacing * i))
 
             # Change button below stats
-            change_rect = pygame.Rect(
-                x, y + spacing * 4 + 10, player_box_rect.width - 40, 60
+            player_btn = Button(
+                (x, y + spacing * 4 + 10, player_box_rect.width - 40, 60),
+                "CHANGE",
+                tiny_font,
+                (200, 200, 100),
+                (255, 255, 150),
             )
-            if (
-                draw_button(
-                    change_rect, "CHANGE", (200, 200, 100), (255, 255, 150), tiny_font
-                )
-                and clicked
-            ):
-                current_player = None
-
         else:
             # Wide box when no player selected
-            player_box_rect = pygame.Rect(WIDTH - 460, 20, 440, 80)
-
-            add_rect = pygame.Rect(
-                player_box_rect.x + 10, player_box_rect.y + 10, 420, 60
+            player_btn = Button(
+                (WIDTH - 450, 30, 420, 60),
+                "SELECT / CREATE PLAYER",
+                tiny_font,
+                (200, 200, 100),
+                (255, 255, 150),
             )
-            if (
-                draw_button(
-                    add_rect,
-                    "SELECT / CREATE PLAYER",
-                    (200, 200, 100),
-                    (255, 255, 150),
-                    tiny_font,
-                )
-                and clicked
-            ):
-                current_player = player_select_menu()
+        return bg, [start_btn, car_btn, score_btn, exit_btn, player_btn]
 
+    def draw_title():
+        wave = math.sin(pygame.time.get_ticks() * 0.002) * 30
+        screen.set_clip(title_band)
+        screen.fill((20, 20, 30))
+        screen.blit(title_text, (title_band.x, HEIGHT // 8 + wave))
+        # the player box and buttons sit on top of the title
+        if current_player:
+            screen.blit(background, player_box_rect, player_box_rect)
+        for b in buttons:
+            b.draw(screen)
+        screen.set_clip(None)
+        return title_band
+
+    def redraw():
+        screen.blit(background, (0, 0))
+        pos = pygame.mouse.get_pos()
+        for b in buttons:
+            b.hover(pos)
+            b.draw(screen)
+        draw_title()
         pygame.display.flip()
-        clock.tick(30)
+
+    background, buttons = build()
+    redraw()
+
+    while True:
+        clicked = None
+        dirty = []
+        for e in wait_events(TITLE_FRAME_MS):
+            if e.type == pygame.QUIT:
+                quit_game()
+            if e.type == pygame.KEYDOWN and e.key in (pygame.K_RETURN, pygame.K_SPACE):
+                pygame.event.clear()
+                return "game"
+            if e.type == pygame.MOUSEMOTION:
+                dirty += repaint_hovered(buttons, e.pos, background)
+            if e.type == pygame.MOUSEBUTTONDOWN and e.button == 1:
+                clicked = e.pos
+
+        # ===== Buttons =====
+        player_btn = buttons[-1]
+        if clicked is None:
+            pass
+        elif start_btn.rect.collidepoint(clicked):
+            if current_player:
+                return "game"
+        elif car_btn.rect.collidepoint(clicked):
+            return "car_select"
+        elif score_btn.rect.collidepoint(clicked):
+            return "leaderboards"
+        elif exit_btn.rect.collidepoint(clicked):
+            quit_game()
+        elif player_btn.rect.collidepoint(clicked):
+            if not current_player:
+                return "player_select"
+            current_player = None
+            background, buttons = build()
+            redraw()
+            continue
+
+        dirty.append(draw_title())
+        pygame.display.update(dirty)
 
 
 def player_select_menu():
-    global players
-    small_font = pygame.font.Font(LEMONMILK_BOLD, 56)
-    tiny_font = pygame.font.Font(LEMONMILK_BOLD, 32)
+    """Pick or create the current player, then back to the menu."""
+    global current_player
+    small_font = get_font(LEMONMILK_BOLD, 56)
+    tiny_font = get_font(LEMONMILK_BOLD, 32)
+
+    background = menu_background((25, 25, 35))
+    title = render_text(small_font, "SELECT PLAYER", (255, 215, 0))
+    background.blit(title, (WIDTH // 2 - title.get_width() // 2, 80))
+
+    # Player buttons
+    y = 200
+    buttons = []
+    for name in players.keys():
+        buttons.append(
+            Button(
+                (WIDTH // 2 - 300, y, 600, 80),
+                name,
+                tiny_font,
+                (100, 100, 140),
+                (120, 180, 255),
+            )
+        )
+        y += 100
+
+    # Add new player button
+    add_btn = Button(
+        (WIDTH // 2 - 300, y + 40, 600, 80),
+        "CREATE NEW PLAYER",
+        tiny_font,
+        (180, 220, 120),
+    )
+
+    # Typing input screen
+    name_box = pygame.Rect(WIDTH // 2 - 250, HEIGHT // 2 - 30, 500, 70)
+    typing_background = background.copy()
+    prompt = render_text(tiny_font, "ENTER NAME:", (255, 215, 0))
+    typing_background.blit(
+        prompt, (WIDTH // 2 - prompt.get_width() // 2, HEIGHT // 2 - 100)
+    )
+    hint = render_text(
+        tiny_font, "Press Enter to Confirm or ESC to Cancel", (200, 200, 200)
+    )
+    typing_background.blit(hint, (WIDTH // 2 - hint.get_width() // 2, HEIGHT // 2 + 80))
+
+    def draw_name():
+        screen.blit(typing_background, name_box, name_box)
+        pygame.draw.rect(screen, (50, 50, 70), name_box, border_radius=10)
+        name_surface = tiny_font.render(new_name or "_", True, (255, 255, 255))
+        screen.blit(
+            name_surface,
+            (WIDTH // 2 - name_surface.get_width() // 2, HEIGHT // 2 - 15),
+        )
+        return name_box
 
-    waiting = True
     typing_name = False
     new_name = ""
 
-    while waiting:
-        screen.fill((25, 25, 35))
-        title = small_font.render("SELECT PLAYER", True, (255, 215, 0))
-        screen.blit(title, (WIDTH // 2 - title.get_width() // 2, 80))
-
-        mx, my = pygame.mouse.get_pos()
-        clicked = False
+    screen.blit(background, (0, 0))
+    pos = pygame.mouse.get_pos()
+    for b in buttons + [add_btn]:
+        b.hover(pos)
+        b.draw(screen)
+    pygame.display.flip()
 
-        for e in pygame.event.get():
+    while True:
+        dirty = []
+        for e in wait_events():
             if e.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-
-            if e.type == pygame.MOUSEBUTTONDOWN and e.button == 1:
-                clicked = True
+                quit_game()
+
+            if not typing_name:
+                if e.type == pygame.MOUSEMOTION:
+                    dirty += repaint_hovered(buttons, e.pos, background)
+                if e.type == pygame.MOUSEBUTTONDOWN and e.button == 1:
+                    for b in buttons:
+                        if b.rect.collidepoint(e.pos):
+                            current_player = b.text
+                            return "menu"
+                    if add_btn.rect.collidepoint(e.pos):
+                        typing_name = True
+                        screen.blit(typing_background, (0, 0))
+                        draw_name()
+                        pygame.display.flip()
 
             if e.type == pygame.KEYDOWN:
                 if e.key == pygame.K_ESCAPE:
-                    return None
+                    current_player = None
+                    return "menu"
 
                 if typing_name:
                     if e.key == pygame.K_RETURN:
                         if new_name.strip():
-                            players[new_name] = {
-                                "Max Distance": 0,
-                                "Coins": 0,
-                                "Flips": 0,
-                            }
-                            save_players(players)
-                            return new_name
+                            player_store.add_player(new_name)
+                            current_player = new_name
+                            return "menu"
                     elif e.key == pygame.K_BACKSPACE:
                         new_name = new_name[:-1]
+                        dirty.append(draw_name())
                     elif len(new_name) < 15 and e.unicode.isprintable():
                         new_name += e.unicode
+                        dirty.append(draw_name())
 
-        y = 200
-        if not typing_name:
-            # Player buttons
-            for name in players.keys():
-                rect = pygame.Rect(WIDTH // 2 - 300, y, 600, 80)
-                hovered = rect.collidepoint(mx, my)
-                color = (120, 180, 255) if hovered else (100, 100, 140)
-                pygame.draw.rect(screen, color, rect, border_radius=12)
-                pygame.draw.rect(screen, (0, 0, 0), rect, 3, border_radius=12)
-                text = tiny_font.render(name, True, (0, 0, 0))
-                screen.blit(
-                    text,
-                    (
-                        rect.centerx - text.get_width() // 2,
-                        rect.centery - text.get_height() // 2,
-                    ),
-                )
-                if hovered and clicked:
-                    return name
-                y += 100
-
-            # Add new player button
-            add_rect = pygame.Rect(WIDTH // 2 - 300, y + 40, 600, 80)
-            pygame.draw.rect(screen, (180, 220, 120), add_rect, border_radius=12)
-            pygame.draw.rect(screen, (0, 0, 0), add_rect, 3, border_radius=12)
-            text = tiny_font.render("CREATE NEW PLAYER", True, (0, 0, 0))
-            screen.blit(
-                text,
-                (
-                    add_rect.centerx - text.get_width() // 2,
-                    add_rect.centery - text.get_height() // 2,
-                ),
-            )
-            if add_rect.collidepoint(mx, my) and clicked:
-                typing_name = True
-
-        else:
-            # Typing input screen
-            prompt = tiny_font.render("ENTER NAME:", True, (255, 215, 0))
-            screen.blit(
-                prompt, (WIDTH // 2 - prompt.get_width() // 2, HEIGHT // 2 - 100)
-            )
-
-            name_surface = tiny_font.render(new_name or "_", True, (255, 255, 255))
-            pygame.draw.rect(
-                screen,
-                (50, 50, 70),
-                (WIDTH // 2 - 250, HEIGHT // 2 - 30, 500, 70),
-                border_radius=10,
-            )
-            screen.blit(
-                name_surface,
-                (WIDTH // 2 - name_surface.get_width() // 2, HEIGHT // 2 - 15),
-            )
-
-            hint = tiny_font.render(
-                "Press Enter to Confirm or ESC to Cancel", True, (200, 200, 200)
-            )
-            screen.blit(hint, (WIDTH // 2 - hint.get_width() // 2, HEIGHT // 2 + 80))
-
-        pygame.display.flip()
-        clock.tick(30)
+        if dirty:
+            pygame.display.update(dirty)
 
 
 def update_player_stats(player_name, distance, coins, flips):
     """
-    Update player's max stats and append run (keeps up to 50 runs).
+    Update player's max stats and append the run to the run log.
     """
-    global players
     if not player_name:
         return
     now = datetime.now().strftime("%Y-%m-%d %H:%M")
-    if player_name not in players:
-        players[player_name] = {"Max Distance": 0, "Coins": 0, "Flips": 0, "Runs": []}
-
-    p = players[player_name]
-    # update maxima
-    p["Max Distance"] = max(p.get("Max Distance", 0), int(distance))
-    p["Coins"] = max(p.get("Coins", 0), int(coins))
-    p["Flips"] = max(p.get("Flips", 0), int(flips))
-
-    # add run record to front
-    p.setdefault("Runs", [])
-    p["Runs"].insert(
-        0,
-        {
-            "distance": int(distance),
-            "coins": int(coins),
-            "flips": int(flips),
-            "time": now,
-        },
-    )
-    # keep most recent 50 runs
-    p["Runs"] = p["Runs"][:50]
-    save_players(players)
+    player_store.record_run(player_name, distance, coins, flips, now)
 
 
-def LEADERBOARDS():
-    global players
-    small_font = pygame.font.Font(LEMONMILK_BOLD, 48)
-    tiny_font = pygame.font.Font(LEMONMILK_REG, 22)
-    waiting = True
-    scroll = 0
+LEADERBOARD_ROWS = 10  # visible rows per table
+LEADERBOARD_ROW_H = 46
+leaderboard_depth = 1000  # how far down the run table scrolls
+leaderboard_rows = LRUCache()
 
-    def collect_runs():
-        runs = []
-        for name, stats in players.items():
-            for r in stats.get("Runs", []):
-                runs.append({"player": name, **r})
-        runs.sort(key=lambda x: x["distance"], reverse=True)
-        return runs
 
-    runs = collect_runs()
+def leaderboard_row(values, col_widths):
+    """A table row of `values` in columns, rendered once into leaderboard_rows."""
 
-    # column widths (adjusted to give better spacing)
-    col_widths_left = [160, 130, 100, 100]
-    col_widths_right = [150, 100, 80, 80, 220]  # added wider for date/time
+    def render(key):
+        values, col_widths = key
+        font = get_font(LEMONMILK_REG, 22)
+        row = pygame.Surface((sum(col_widths) + 40, 38))
+        row.fill((25, 25, 35))
+        rect = row.get_rect()
+        pygame.draw.rect(row, (40, 40, 60), rect, border_radius=6)
+        pygame.draw.rect(row, (60, 60, 90), rect, 2, border_radius=6)
+        x = 30
+        for val, w in zip(values, col_widths):
+            txt = font.render(val, True, (255, 255, 255))
+            row.blit(txt, (x, rect.centery - txt.get_height() // 2))
+            x += w
+        return row
 
-    while waiting:
-        screen.fill((25, 25, 35))
-        title = small_font.render("LEADERBOARDS", True, (255, 215, 0))
-        screen.blit(title, (WIDTH // 2 - title.get_width() // 2, 40))
-
-        # per-player bests (left)
-        left_x = WIDTH // 4
-        y = 140
-        header_texts = ["PLAYER", "MAX DIST", "COINS", "FLIPS"]
-        header_x = left_x - sum(col_widths_left) // 2
-
-        for i, text in enumerate(header_texts):
-            hdr = tiny_font.render(text, True, (255, 200, 100))
-            screen.blit(hdr, (header_x + sum(col_widths_left[:i]) + 10, y))
-        y += 50
-
-        sorted_players = sorted(
-            players.items(), key=lambda p: p[1].get("Max Distance", 0), reverse=True
-        )
-        for name, st in sorted_players[:10]:
-            row_rect = pygame.Rect(
-                left_x - sum(col_widths_left) // 2 - 20,
-                y - 6,
-                sum(col_widths_left) + 40,
-                38,
-            )
-            pygame.draw.rect(screen, (40, 40, 60), row_rect, border_radius=6)
-            pygame.draw.rect(screen, (60, 60, 90), row_rect, 2, border_radius=6)
+    return leaderboard_rows.get((values, col_widths), render)
 
-            values = [
-                name,
-                f"{st.get('Max Distance', 0)}m",
-                str(st.get("Coins", 0)),
-                str(st.get("Flips", 0)),
-            ]
-            for i, val in enumerate(values):
-                txt = tiny_font.render(val, True, (255, 255, 255))
-                txt_y = row_rect.centery - txt.get_height() // 2  # centered vertically
-                screen.blit(txt, (header_x + sum(col_widths_left[:i]) + 10, txt_y))
-            y += 46  # extra spacing
-
-        # global top runs (right)
-        right_x = WIDTH * 3 // 4
-        y2 = 140
-        header2_texts = ["PLAYER", "DIST", "COINS", "FLIPS", "DATE/TIME"]
-        header2_x = right_x - sum(col_widths_right) // 2
-
-        for i, text in enumerate(header2_texts):
-            hdr = tiny_font.render(text, True, (255, 200, 100))
-            screen.blit(hdr, (header2_x + sum(col_widths_right[:i]) + 10, y2))
-        y2 += 50
-
-        start_index = scroll // 46
-        for run in runs[start_index : start_index + 10]:
-            row_rect = pygame.Rect(
-                right_x - sum(col_widths_right) // 2 - 20,
-                y2 - 6,
-                sum(col_widths_right) + 40,
-                38,
-            )
-            pygame.draw.rect(screen, (40, 40, 60), row_rect, border_radius=6)
-            pygame.draw.rect(screen, (60, 60, 90), row_rect, 2, border_radius=6)
 
-            values = [
+def LEADERBOARDS():
+    small_font = get_font(LEMONMILK_BOLD, 48)
+    tiny_font = get_font(LEMONMILK_REG, 22)
+    waiting = True
+    first = 0  # index of the top visible run
+    last_first = max(
+        0, min(player_store.run_count(), leaderboard_depth) - LEADERBOARD_ROWS
+    )
+
+    # column widths (adjusted to give better spacing)
+    col_widths_left = (160, 130, 100, 100)
+    col_widths_right = (150, 100, 80, 80, 220)  # added wider for date/time
+
+    # everything but the scrolling run list is drawn once
+    background = menu_background((25, 25, 35))
+    title = render_text(small_font, "LEADERBOARDS", (255, 215, 0))
+    background.blit(title, (WIDTH // 2 - title.get_width() // 2, 40))
+
+    # per-player bests (left)
+    left_x = WIDTH // 4
+    y = 140
+    header_texts = ["PLAYER", "MAX DIST", "COINS", "FLIPS"]
+    header_x = left_x - sum(col_widths_left) // 2
+
+    for i, text in enumerate(header_texts):
+        hdr = render_text(tiny_font, text, (255, 200, 100))
+        background.blit(hdr, (header_x + sum(col_widths_left[:i]) + 10, y))
+    y += 50
+
+    for name, st in player_store.top_players("distance", LEADERBOARD_ROWS):
+        values = (
+            name,
+            f"{st.get('Max Distance', 0)}m",
+            str(st.get("Coins", 0)),
+            str(st.get("Flips", 0)),
+        )
+        background.blit(
+            leaderboard_row(values, col_widths_left), (header_x - 20, y - 6)
+        )
+        y += LEADERBOARD_ROW_H  # extra spacing
+
+    # global top runs (right)
+    right_x = WIDTH * 3 // 4
+    y2 = 140
+    header2_texts = ["PLAYER", "DIST", "COINS", "FLIPS", "DATE/TIME"]
+    header2_x = right_x - sum(col_widths_right) // 2
+
+    for i, text in enumerate(header2_texts):
+        hdr = render_text(tiny_font, text, (255, 200, 100))
+        background.blit(hdr, (header2_x + sum(col_widths_right[:i]) + 10, y2))
+    y2 += 50
+    runs_area = pygame.Rect(
+        header2_x - 20,
+        y2 - 6,
+        sum(col_widths_right) + 40,
+        LEADERBOARD_ROW_H * LEADERBOARD_ROWS,
+    )
+
+    # BACK BUTTON
+    back_btn = Button(
+        (WIDTH // 2 - 120, HEIGHT - 100, 240, 64), "BACK", tiny_font, (220, 120, 120)
+    )
+    back_btn.draw(background)
+
+    def draw_runs():
+        # only the visible page is queried, and each row is rendered once
+        screen.blit(background, runs_area, runs_area)
+        y = runs_area.y
+        for run in player_store.top_runs("distance", LEADERBOARD_ROWS, first):
+            values = (
                 run["player"],
                 f"{run['distance']}m",
                 str(run["coins"]),
                 str(run["flips"]),
                 run["time"][:19],  # shorten timestamp if too long
-            ]
-            for i, val in enumerate(values):
-                txt = tiny_font.render(val, True, (255, 255, 255))
-                txt_y = row_rect.centery - txt.get_height() // 2
-                screen.blit(txt, (header2_x + sum(col_widths_right[:i]) + 10, txt_y))
-            y2 += 46
-
-        # BACK BUTTON
-        back_rect = pygame.Rect(WIDTH // 2 - 120, HEIGHT - 100, 240, 64)
-        pygame.draw.rect(screen, (220, 120, 120), back_rect, border_radius=12)
-        pygame.draw.rect(screen, (0, 0, 0), back_rect, 3, border_radius=12)
-        back_text = tiny_font.render("BACK", True, (0, 0, 0))
-        screen.blit(
-            back_text,
-            (
-                back_rect.centerx - back_text.get_width() // 2,
-                back_rect.centery - back_text.get_height() // 2,
-            ),
-        )
+            )
+            screen.blit(leaderboard_row(values, col_widths_right), (runs_area.x, y))
+            y += LEADERBOARD_ROW_H
+        return runs_area
+
+    screen.blit(background, (0, 0))
+    draw_runs()
+    pygame.display.flip()
 
+    while waiting:
+        old_first = first
         # input handling
-        for e in pygame.event.get():
+        for e in wait_events():
             if e.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+                quit_game()
             if e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE:
                 waiting = False
             if e.type == pygame.MOUSEBUTTONDOWN:
-                if e.button == 1 and back_rect.collidepoint(e.pos):
+                if e.button == 1 and back_btn.rect.collidepoint(e.pos):
                     waiting = False
                 elif e.button == 4:
-                    scroll = max(0, scroll - 46)
+                    first = max(0, first - 1)
                 elif e.button == 5:
-                    scroll += 46
+                    first = min(last_first, first + 1)
 
-        pygame.display.flip()
-        clock.tick(30)
+        if waiting and first != old_first:
+            pygame.display.update(draw_runs())
+    return "menu"
 
 
 def confirm_exit_menu():
-    small_font = pygame.font.Font(
-        LEMONMILK_BOLD,
-        64,
+    small_font = get_font(LEMONMILK_BOLD, 64)
+    button_font = get_font(LEMONMILK_BOLD, 48)
+
+    background = menu_background((20, 20, 20))
+    prompt = render_text(small_font, "Return to Main Menu?", (255, 255, 255))
+    background.blit(prompt, (WIDTH // 2 - prompt.get_width() // 2, HEIGHT // 3))
+
+    yes_btn = Button(
+        (WIDTH // 2 - 220, HEIGHT // 2, 180, 80),
+        "YES",
+        button_font,
+        (255, 100, 100),
+        (255, 150, 150),
+        border=0,
     )
-    button_font = pygame.font.Font(
-        LEMONMILK_BOLD,
-        48,
+    no_btn = Button(
+        (WIDTH // 2 + 40, HEIGHT // 2, 180, 80),
+        "NO",
+        button_font,
+        (120, 255, 120),
+        (160, 255, 160),
+        border=0,
     )
+    buttons = [yes_btn, no_btn]
 
-    yes_rect = pygame.Rect(WIDTH // 2 - 220, HEIGHT // 2, 180, 80)
-    no_rect = pygame.Rect(WIDTH // 2 + 40, HEIGHT // 2, 180, 80)
+    screen.blit(background, (0, 0))
+    pos = pygame.mouse.get_pos()
+    for b in buttons:
+        b.hover(pos)
+        b.draw(screen)
+    pygame.display.flip()
 
     while True:
-        screen.fill((20, 20, 20))
-        prompt = small_font.render("Return to Main Menu?", True, (255, 255, 255))
-        screen.blit(prompt, (WIDTH // 2 - prompt.get_width() // 2, HEIGHT // 3))
-
-        mx, my = pygame.mouse.get_pos()
-        clicked = False
-        for e in pygame.event.get():
+        dirty = []
+        for e in wait_events():
             if e.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+                quit_game()
             if e.type == pygame.KEYDOWN:
                 if e.key == pygame.K_ESCAPE:
                     return False
+            if e.type == pygame.MOUSEMOTION:
+                dirty += repaint_hovered(buttons, e.pos, background)
             if e.type == pygame.MOUSEBUTTONDOWN and e.button == 1:
-                clicked = True
-
-        def draw_button(rect, text, base_col, hover_col):
-            hovered = rect.collidepoint(mx, my)
-            color = hover_col if hovered else base_col
-            pygame.draw.rect(screen, color, rect, border_radius=12)
-            label = button_font.render(text, True, (0, 0, 0))
-            screen.blit(
-                label,
-                (
-                    rect.centerx - label.get_width() // 2,
-                    rect.centery - label.get_height() // 2,
-                ),
-            )
-            return hovered
-
-        if draw_button(yes_rect, "YES", (255, 100, 100), (255, 150, 150)) and clicked:
-            return True
-        if draw_button(no_rect, "NO", (120, 255, 120), (160, 255, 160)) and clicked:
-            return False
-
-        pygame.display.flip()
-        clock.tick(30)
+                if yes_btn.rect.collidepoint(e.pos):
+                    return True
+                if no_btn.rect.collidepoint(e.pos):
+                    return False
+        if dirty:
+            pygame.display.update(dirty)
 
 
 def show_game_over(reason_text):
@@ -818,365 +1078,636 @@ def show_game_over(reason_text):
     if current_player:
         update_player_stats(current_player, distance_traveled, coin_score, flip_count)
 
-    small_font = pygame.font.Font(LEMONMILK_BOLD, 38)
-    button_font = pygame.font.Font(LEMONMILK_BOLD, 32)
-    btn_rect = pygame.Rect(WIDTH - 300, HEIGHT - 120, 260, 80)
-
-    waiting = True
-    while waiting:
-        screen.fill((10, 10, 10))
-        reason = small_font.render(reason_text, True, (255, 60, 60))
-        score_info = button_font.render(
-            f"Coins: {coin_score}  |  Flips: {flip_count}  |  Distance: {int(distance_traveled)}m",
-            True,
-            (255, 255, 255),
-        )
-        screen.blit(
-            score_info, (WIDTH // 2 - score_info.get_width() // 2, HEIGHT // 2 - 60)
-        )
-        info = button_font.render("Press ESC or click RETURN", True, (255, 255, 255))
+    small_font = get_font(LEMONMILK_BOLD, 38)
+    button_font = get_font(LEMONMILK_BOLD, 32)
+    btn = Button(
+        (WIDTH - 300, HEIGHT - 120, 260, 80),
+        "RETURN",
+        button_font,
+        (255, 50, 50),
+        border=0,
+    )
 
-        screen.blit(reason, (WIDTH // 2 - reason.get_width() // 2, HEIGHT // 3))
-        pygame.draw.rect(screen, (255, 50, 50), btn_rect, border_radius=12)
-        label = button_font.render("RETURN", True, (0, 0, 0))
-        screen.blit(
-            label,
-            (
-                btn_rect.centerx - label.get_width() // 2,
-                btn_rect.centery - label.get_height() // 2,
-            ),
-        )
-        screen.blit(info, (WIDTH // 2 - info.get_width() // 2, HEIGHT // 2 + 100))
+    # nothing on this screen changes, so it is drawn once
+    screen.fill((10, 10, 10))
+    reason = render_text(small_font, reason_text, (255, 60, 60))
+    score_info = render_text(
+        button_font,
+        f"Coins: {coin_score}  |  Flips: {flip_count}  |  Distance: {int(distance_traveled)}m",
+        (255, 255, 255),
+    )
+    screen.blit(
+        score_info, (WIDTH // 2 - score_info.get_width() // 2, HEIGHT // 2 - 60)
+    )
+    info = render_text(button_font, "Press ESC or click RETURN", (255, 255, 255))
 
-        pygame.display.flip()
+    screen.blit(reason, (WIDTH // 2 - reason.get_width() // 2, HEIGHT // 3))
+    btn.draw(screen)
+    screen.blit(info, (WIDTH // 2 - info.get_width() // 2, HEIGHT // 2 + 100))
+    pygame.display.flip()
 
-        for e in pygame.event.get():
+    waiting = True
+    while waiting:
+        for e in wait_events():
             if e.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+                quit_game()
             if e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE:
                 waiting = False
             if (
                 e.type == pygame.MOUSEBUTTONDOWN
                 and e.button == 1
-                and btn_rect.collidepoint(e.pos)
+                and btn.rect.collidepoint(e.pos)
             ):
                 waiting = False
-        clock.tick(30)
-    main_menu()
+    return "menu"
 
 
 # ===== GAME LOOP =====
-def game_loop():
-    reset_game_state()
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+
+
+def read_controls():
+    """Current keyboard state as an INPUT_* bitmask."""
+    keys = pygame.key.get_pressed()
+    bits = 0
+    if keys[pygame.K_a] or keys[pygame.K_LEFT]:
+        bits |= INPUT_LEFT
+    if keys[pygame.K_d] or keys[pygame.K_RIGHT]:
+        bits |= INPUT_RIGHT
+    return bits
+
+
+def game_loop(
+    controls=read_controls, render=None, max_ticks=None, seed=None, profiler=None
+):
+    """Play one run; returns the game-over reason.
+
+    controls() is polled once per tick for an INPUT_* bitmask, also kept
+    in input_log, so the same seed and inputs always replay the same run.
+    render defaults to not HEADLESS; unrendered runs draw nothing and pump
+    no events. profiler is a FrameProfiler to fill with per-stage timings.
+    Returns None when the run was quit or reached max_ticks.
+    """
+    if render is None:
+        render = not HEADLESS
+    wait_for_assets()
+    # below native size the world is drawn to world_surface and scaled
+    # onto the window once per frame
+    scaled = render and world_surface is not None
+    if scaled:
+        set_render_target(world_surface)
+    reset_game_state(seed)
     global \
         fuel, \
         distance_traveled, \
         coin_score, \
         game_time, \
         out_of_gas_time, \
-        track_x, \
         engine_disabled, \
         upside_down_start, \
         flip_count
     global cam_x, cam_y
 
-    selected_car_img = car_images[selected_car_index]
+    global player_car
+    selected_car_img = car_game_images[selected_car_index]
     car_img, car_body, car_shape, car_w, car_h = create_car(selected_car_img)
-    floating_texts = []
-
-    coin_font = pygame.font.Font(
-        LEMONMILK_BOLD,
-        32,
-    )
-    dist_font = pygame.font.Font(
-        LEMONMILK_BOLD,
-        48,
-    )
-
+    player_car = car_body
+
+    global show_profiler
+    # without a profiler passed in, frames are only timed for the F3
+    # overlay or profile_log
+    prof = profiler
+    if prof is None and (show_profiler or profile_log) and render:
+        prof = FrameProfiler(history=120, sink=profile_log)
+    if render:
+        # the HUD is laid out for the surface it goes on: the world, scaled
+        # up along with it, or the window itself with native_hud
+        native_layer = scaled and native_hud
+        hud = display if native_layer else screen
+        hud_w = hud.get_width()
+        hud_scale = hud_w / WIDTH
+
+        def hs(v):
+            return round(v * hud_scale)
+
+        coin_font = get_font(LEMONMILK_BOLD, hs(32))
+        dist_font = get_font(LEMONMILK_BOLD, hs(48))
+        hud_coin_icon = hud_image("coin_icon", coin_icon, hud_scale)
+        hud_gas_icon = hud_image("gas_icon_ui", gas_icon_ui, hud_scale)
+        profiler_font = get_font(LEMONMILK_REG, hs(14))
+        # HUD numbers are drawn from glyph atlases, so no text is rendered per frame
+        dist_atlas = text_cache.atlas(dist_font, (0, 0, 0), DIGITS + " m")
+        hud_font = get_font(LEMONMILK_BOLD, hs(24))
+        speed_atlas = text_cache.atlas(hud_font, (0, 0, 0), DIGITS + " km/h")
+        fps_atlas = text_cache.atlas(hud_font, (0, 255, 0), DIGITS + "FPS: ")
+        coin_atlas = text_cache.atlas(coin_font, (255, 215, 0))
+        car_sprite = car_rotations(selected_car_index)
+    tick_dt = 1 / physics_hz
+    frame_dt = tick_dt
+    accumulator = 0.0
+    car_x, car_y = car_body.position
+    prev_x, prev_y, prev_angle = car_x, car_y, car_body.angle
+    prev_cam_x, prev_cam_y = cam_x, cam_y
+    vx = 0
+    game_over_reason = None
+    done = False
     running = True
+    clock.tick()  # the first frame shouldn't count the time spent in the menus
     while running:
-        dt = 1 / 60
-        game_time += dt
-
-        for e in pygame.event.get():
-            if e.type == pygame.QUIT:
-                running = False
-            if e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE:
-                paused = True
-                if confirm_exit_menu():
-                    return
-                paused = False
-
-        keys = pygame.key.get_pressed()
-        on_ground = bool(space.shape_query(car_shape))
-        vx, vy = car_body.velocity
-
-        out_of_fuel = fuel <= 0
-        if out_of_fuel and out_of_gas_time is None:
-            out_of_gas_time = game_time
-
-        # DRIVE
-        if not out_of_fuel:
-            angle_deg = math.degrees(car_body.angle) % 360
-            angular_speed = abs(car_body.angular_velocity)
-            vel_mag = (car_body.velocity[0] ** 2 + car_body.velocity[1] ** 2) ** 0.5
-
-            if 170 < angle_deg < 190 and angular_speed < 1:
-                engine_disabled = True
-            # check if mostly upside down (170–190°)
-            if 170 < angle_deg < 190 and vel_mag < 70 and angular_speed < 1:
-                if upside_down_start is None:
-                    upside_down_start = game_time
-                elif game_time - upside_down_start > 5:
-                    # Only after 5 seconds of being still
-                    show_game_over("You Flipped! Game Over!")
-                    return
-            else:
-                upside_down_start = None  # reset timer if moved or recovered
-
-            if on_ground:
-                if not engine_disabled:
-                    if (keys[pygame.K_d] or keys[pygame.K_RIGHT]) and vx < speed_limit:
-                        car_body.apply_force_at_local_point((accel_force, 0))
-                        fuel -= fuel_accel_drain
-                    if (keys[pygame.K_a] or keys[pygame.K_LEFT]) and vx > -speed_limit:
-                        car_body.apply_force_at_local_point((-accel_force, 0))
-                        fuel -= fuel_accel_drain
-            else:
-                # IN-AIR: apply player torque, but ALWAYS track rotation delta every frame
-                angular_impulse = 0.15  # tweak for sensitivity
-                # apply instant angular changes (no wind-up)
-                if keys[pygame.K_a] or keys[pygame.K_LEFT]:
-                    if car_body.angular_velocity <= 5:
-                        car_body.angular_velocity += angular_impulse
-                if keys[pygame.K_d] or keys[pygame.K_RIGHT]:
-                    if car_body.angular_velocity >= -5:
-                        car_body.angular_velocity -= angular_impulse
-
-                # initialize rotation tracking fields on first airborne frame
-                if not hasattr(car_body, "rot_accum"):
-                    car_body.rot_accum = 0.0
+        if prof:
+            prof.start()
+
+        if render:
+            for e in pygame.event.get():
+                if e.type == pygame.QUIT:
+                    running = False
+                if e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE:
+                    paused = True
+                    if scaled:
+                        set_render_target(display)
+                    if confirm_exit_menu():
+                        return None
+                    if scaled:
+                        set_render_target(world_surface)
+                    paused = False
+                    clock.tick()  # don't simulate the time spent paused
+                if e.type == pygame.KEYDOWN and e.key == pygame.K_F3:
+                    show_profiler = not show_profiler
+                    if show_profiler and prof is None:
+                        prof = FrameProfiler(history=120)
+                    elif not show_profiler and profiler is None and not profile_log:
+                        prof = None
+
+        # FIXED TIMESTEP: ticks of 1/physics_hz seconds, each split into
+        # physics_substeps space steps. A presented frame adds the time it
+        # took and runs as many whole ticks as that covers; otherwise
+        # frame_dt stays tick_dt, one tick a pass, as fast as it can go
+        accumulator += frame_dt
+        while accumulator >= tick_dt:
+            if max_ticks is not None and len(input_log) >= max_ticks:
+                done = True
+                break
+            accumulator -= tick_dt
+            prev_x, prev_y, prev_angle = car_x, car_y, car_body.angle
+            prev_cam_x, prev_cam_y = cam_x, cam_y
+            dt = tick_dt
+            game_time += dt
+
+            bits = controls()
+            input_log.append(bits)
+            if prof:
+                prof.mark("input")
+            left = bits & INPUT_LEFT
+            right = bits & INPUT_RIGHT
+            on_ground = bool(space.shape_query(car_shape))
+            vx, vy = car_body.velocity
+            car_x, car_y = car_body.position
+
+            out_of_fuel = fuel <= 0
+            if out_of_fuel and out_of_gas_time is None:
+                out_of_gas_time = game_time
+
+            # DRIVE
+            if not out_of_fuel:
+                angle_deg = math.degrees(car_body.angle) % 360
+                angular_speed = abs(car_body.angular_velocity)
+                vel_mag = (car_body.velocity[0] ** 2 + car_body.velocity[1] ** 2) ** 0.5
+
+                if 170 < angle_deg < 190 and angular_speed < 1:
+                    engine_disabled = True
+                # check if mostly upside down (170–190°)
+                if 170 < angle_deg < 190 and vel_mag < 70 and angular_speed < 1:
+                    if upside_down_start is None:
+                        upside_down_start = game_time
+                    elif game_time - upside_down_start > 5:
+                        # Only after 5 seconds of being still
+                        game_over_reason = "You Flipped! Game Over!"
+                        break
+                else:
+                    upside_down_start = None  # reset timer if moved or recovered
+
+                if on_ground:
+                    if not engine_disabled:
+                        if right and vx < speed_limit:
+                            car_body.apply_force_at_local_point((accel_force, 0))
+                            fuel -= fuel_accel_drain * dt
+                        if left and vx > -speed_limit:
+                            car_body.apply_force_at_local_point((-accel_force, 0))
+                            fuel -= fuel_accel_drain * dt
+                else:
+                    # IN-AIR: apply player torque, but ALWAYS track rotation delta every frame
+                    angular_impulse = air_spin_rate * dt
+                    # apply instant angular changes (no wind-up)
+                    if left:
+                        if car_body.angular_velocity <= 5:
+                            car_body.angular_velocity += angular_impulse
+                    if right:
+                        if car_body.angular_velocity >= -5:
+                            car_body.angular_velocity -= angular_impulse
+
+                    # initialize rotation tracking fields on first airborne frame
+                    if not hasattr(car_body, "rot_accum"):
+                        car_body.rot_accum = 0.0
+                        car_body.last_angle = car_body.angle
+
+                    # compute angle delta this frame (in degrees) and normalize across wrap
+                    current_angle = math.degrees(car_body.angle) % 360
+                    last_angle_deg = math.degrees(car_body.last_angle) % 360
+                    delta = current_angle - last_angle_deg
+                    # normalize to [-180, 180] to handle wrap-around
+                    if delta > 180:
+                        delta -= 360
+                    elif delta < -180:
+                        delta += 360
+
+                    car_body.rot_accum += delta
+
+                    # full flip detection (±360° accumulated)
+                    if abs(car_body.rot_accum) >= 360.0:
+                        flip_count += 1
+                        coin_score += 1000
+                        car_body.rot_accum = 0.0  # reset for next flip
+                        floating_texts.spawn(
+                            f"+1000 FLIP #{flip_count}!", car_x, car_y - 60, 2.0
+                        )
+
+                    # save current angle for next frame
                     car_body.last_angle = car_body.angle
 
-                # compute angle delta this frame (in degrees) and normalize across wrap
-                current_angle = math.degrees(car_body.angle) % 360
-                last_angle_deg = math.degrees(car_body.last_angle) % 360
-                delta = current_angle - last_angle_deg
-                # normalize to [-180, 180] to handle wrap-around
-                if delta > 180:
-                    delta -= 360
-                elif delta < -180:
-                    delta += 360
-
-                car_body.rot_accum += delta
-
-                # full flip detection (±360° accumulated)
-                if abs(car_body.rot_accum) >= 360.0:
-                    flip_count += 1
-                    coin_score += 1000
-                    car_body.rot_accum = 0.0  # reset for next flip
-                    floating_texts.append(
-                        {
-                            "text": f"+1000 FLIP #{flip_count}!",
-                            "x": car_body.position.x,
-                            "y": car_body.position.y - 60,
-                            "timer": 2.0,
-                            "color": (0, 0, 0),
-                        }
-                    )
-
-                # save current angle for next frame
-                car_body.last_angle = car_body.angle
-
-            fuel -= fuel_deplete_rate
-        else:
-            if game_time - out_of_gas_time > 5:
-                show_game_over("Out of Gas, Game Over!")
-                return
-
-        fuel = max(0, fuel)
-
-        # SMART GAS SPAWN
-        if fuel < low_fuel_threshold:
-            nearest_can_ahead = None
-            for g in gas_cans:
-                if g["x"] > car_body.position.x:
-                    nearest_can_ahead = g
+                fuel -= fuel_deplete_rate * dt
+            else:
+                if game_time - out_of_gas_time > 5:
+                    game_over_reason = "Out of Gas, Game Over!"
                     break
-            if (not nearest_can_ahead) or (
-                nearest_can_ahead["x"] - car_body.position.x > min_gas_distance
-            ):
-                new_x = car_body.position.x + smart_spawn_distance
-                spawn_gas_can(new_x)
-
-        # TRACK EXTENSION
-        space.step(dt)
-        while track_pts[-1][0] - car_body.position.x < buffer_ahead:
-            add_track_point(track_x)
-            track_x += track_step
-        while track_pts and track_pts[1][0] < car_body.position.x - buffer_behind:
-            track_pts.pop(0)
-
-        # COINS
-        global next_coin_x
-        if car_body.position.x > next_coin_x - 4000:
-            next_coin_x += random.randint(coin_spacing_min, coin_spacing_max)
-            spawn_coin_group(next_coin_x)
-
-        for coin in coins:
-            if not coin["collected"]:
-                dx = coin["x"] - car_body.position.x
-                dy = coin["y"] - car_body.position.y
-                if dx * dx + dy * dy < (coin_radius + car_w * 0.3) ** 2:
-                    coin["collected"] = True
-                    floating_texts.append(
-                        {
-                            "text": "+1",
-                            "x": coin["x"],
-                            "y": coin["y"] - 40,
-                            "timer": 1.0,
-                            "color": (0, 0, 0),
-                        }
-                    )
-                    coin_score += coin["value"]
-                    floating_texts.append(
-                        {
-                            "text": f"+{coin['value']}",
-                            "x": coin["x"],
-                            "y": coin["y"] - 40,
-                            "timer": 1.0,
-                            "color": (0, 0, 0),
-                        }
-                    )
-
-        coins[:] = [c for c in coins if c["x"] > car_body.position.x - buffer_behind]
 
-        # update clouds
-        # update clouds
-        for cloud in clouds:
-            cloud["x"] -= cloud["speed"]
-
-            # check offscreen using parallax offset
-            if cloud["x"] - cam_x * 0.3 < -cloud["img"].get_width():
-                cloud["x"] = cam_x + WIDTH + random.randint(200, 600)
-                cloud["y"] = random.randint(40, 260)
-                cloud["img"] = pygame.transform.rotozoom(
-                    random.choice(cloud_images), 0, random.uniform(0.25, 0.6)
-                )
-
-        # GAS COLLECTION
-        for gas in gas_cans:
-            if not gas["collected"]:
-                dx = gas["x"] - car_body.position.x
-                dy = gas["y"] - car_body.position.y
-                if dx * dx + dy * dy < (gas_radius + car_w * 0.4) ** 2:
-                    gas["collected"] = True
-                    fuel = min(100, fuel + gas_refill_amount)
-                    out_of_gas_time = None
-        gas_cans[:] = [
-            g for g in gas_cans if g["x"] > car_body.position.x - buffer_behind
-        ]
-
-        # CAMERA
-        target_cam_x = int(car_body.position.x - WIDTH // 2)
-        target_cam_y = int((car_body.position.y - HEIGHT // 2) - 100)
-        cam_x += (target_cam_x - cam_x) * cam_smooth
-        cam_y += (target_cam_y - cam_y) * cam_smooth
+            fuel = max(0, fuel)
+            if prof:
+                prof.mark("drive")
+
+            # SMART GAS SPAWN
+            if fuel < low_fuel_threshold:
+                nearest_can_ahead = gas_cans.first_after(car_x)
+                if (not nearest_can_ahead) or (
+                    nearest_can_ahead.x - car_x > min_gas_distance
+                ):
+                    new_x = car_x + smart_spawn_distance
+                    spawn_gas_can(new_x)
+
+            if prof:
+                prof.mark("gas_spawn")
+
+            # TRACK EXTENSION
+            for _ in range(physics_substeps):
+                space.step(dt / physics_substeps)
+            if prof:
+                prof.mark("physics")
+            car_x, car_y = car_body.position
+            terrain.extend_to(car_x + buffer_ahead)
+            terrain.retire_before(car_x - buffer_behind)
+            if prof:
+                prof.mark("track")
+
+            # COINS
+            global next_coin_x
+            if car_x > next_coin_x - 4000:
+                next_coin_x += rng.randint(coin_spacing_min, coin_spacing_max)
+                spawn_coin_group(next_coin_x)
+
+            reach = coin_radius + car_w * 0.3
+            for coin in coins.window(car_x - reach, car_x + reach):
+                if not coin.collected:
+                    dx = coin.x - car_x
+                    dy = coin.y - car_y
+                    if dx * dx + dy * dy < reach * reach:
+                        coin.collected = True
+                        coin_score += coin.value
+                        floating_texts.spawn(f"+{coin.value}", coin.x, coin.y - 40)
+
+            coins.drop_before(car_x - buffer_behind)
+            if prof:
+                prof.mark("coins")
+
+            # update clouds (purely visual)
+            if render:
+                sky.update(sky_rng, cam_x)
+            if prof:
+                prof.mark("clouds")
+
+            # GAS COLLECTION
+            reach = gas_radius + car_w * 0.4
+            for gas in gas_cans.window(car_x - reach, car_x + reach):
+                if not gas.collected:
+                    dx = gas.x - car_x
+                    dy = gas.y - car_y
+                    if dx * dx + dy * dy < reach * reach:
+                        gas.collected = True
+                        fuel = min(100, fuel + gas_refill_amount)
+                        out_of_gas_time = None
+            gas_cans.drop_before(car_x - buffer_behind)
+            if prof:
+                prof.mark("gas")
+
+            # CAMERA
+            target_cam_x = int(car_x - WIDTH // 2)
+            target_cam_y = int((car_y - HEIGHT // 2) - 100)
+            cam_x += (target_cam_x - cam_x) * cam_smooth
+            cam_y += (target_cam_y - cam_y) * cam_smooth
+
+            distance_traveled += vx / PPM * dt
+            if prof:
+                prof.mark("camera")
+
+        if game_over_reason is not None or done:
+            break
+
+        if not render:
+            floating_texts.clear()  # only ever drawn, never read back
+            if prof:
+                prof.end()
+            continue
+
+        # draw the car and camera interpolated between the last two ticks,
+        # by how far the leftover accumulator is into the next one
+        alpha = accumulator / tick_dt
+        view_x = prev_cam_x + (cam_x - prev_cam_x) * alpha
+        view_y = prev_cam_y + (cam_y - prev_cam_y) * alpha
+        draw_x = prev_x + (car_x - prev_x) * alpha
+        draw_y = prev_y + (car_y - prev_y) * alpha
+        draw_angle = prev_angle + (car_body.angle - prev_angle) * alpha
 
         # DRAW
         screen.fill((135, 206, 235))
 
-        # draw clouds
         # draw clouds (parallax)
-        for cloud in clouds:
-            screen.blit(cloud["img"], (cloud["x"] - cam_x * 0.3, cloud["y"]))
-
-        for i in range(len(track_pts) - 1):
-            x1, y1 = track_pts[i]
-            x2, y2 = track_pts[i + 1]
-            if x2 < cam_x:
-                continue
-            if x1 - cam_x > WIDTH:
-                break
-            poly_pts = [
-                (x1 - cam_x, HEIGHT),
-                (x1 - cam_x, y1 - cam_y),
-                (x2 - cam_x, y2 - cam_y),
-                (x2 - cam_x, HEIGHT),
-            ]
-            pygame.draw.polygon(screen, (139, 69, 19), poly_pts)
-            dx, dy = x2 - x1, y2 - y1
-            seg_len = max(1, math.hypot(dx, dy))
-            angle = math.degrees(math.atan2(-dy, dx))
-            piece = pygame.transform.rotozoom(
-                grass_tex, angle, seg_len / grass_tex.get_width()
-            )
-            pos = (x1 - cam_x, y1 - cam_y)
-            screen.blit(piece, piece.get_rect(midleft=pos))
+        sky.draw(screen, view_x)
+        if prof:
+            prof.mark("sky")
 
-        for coin in coins:
-            if not coin["collected"]:
-                icon_rect = coin["image"].get_rect(
-                    center=(int(coin["x"] - cam_x), int(coin["y"] - cam_y))
+        if bake_terrain:
+            terrain_renderer.draw(screen, terrain, view_x, view_y)
+        else:
+            track_pts = terrain.points.between(view_x, view_x + WIDTH)
+            draw_terrain_segments(
+                screen, track_pts, view_x, view_y, grass_tex, (139, 69, 19)
+            )
+        if prof:
+            prof.mark("terrain")
+
+        # only what is on screen, give or take a sprite width
+        for coin in coins.window(view_x - 100, view_x + WIDTH + 100):
+            if not coin.collected:
+                icon_rect = coin.image.get_rect(
+                    center=(int(coin.x - view_x), int(coin.y - view_y))
                 )
-                screen.blit(coin["image"], icon_rect)
+                screen.blit(coin.image, icon_rect)
 
-        for gas in gas_cans:
-            if not gas["collected"]:
+        for gas in gas_cans.window(view_x - 100, view_x + WIDTH + 100):
+            if not gas.collected:
                 icon_rect = gas_icon.get_rect(
-                    center=(int(gas["x"] - cam_x), int(gas["y"] - cam_y))
+                    center=(int(gas.x - view_x), int(gas.y - view_y))
                 )
                 screen.blit(gas_icon, icon_rect)
 
-        rotated = pygame.transform.rotate(car_img, -math.degrees(car_body.angle))
-        rect = rotated.get_rect(
-            center=(car_body.position.x - cam_x, car_body.position.y - cam_y)
-        )
+        rotated = car_sprite.get(-math.degrees(draw_angle))
+        rect = rotated.get_rect(center=(draw_x - view_x, draw_y - view_y))
         screen.blit(rotated, rect)
+        if prof:
+            prof.mark("sprites")
+
+        floating_texts.draw(screen, view_x, view_y)
+        floating_texts.update(frame_dt)
+        if prof:
+            prof.mark("texts")
+
+        if native_layer:
+            # the one resample of the frame; the HUD goes on afterwards
+            pygame.transform.scale(screen, hud.get_size(), hud)
+            if prof:
+                prof.mark("scale")
 
-        distance_traveled += vx / PPM * dt
         speed_mps = vx / PPM
         speed_kmh = speed_mps * 3.6
-        dist_text = dist_font.render(f"{int(distance_traveled)} m", True, (0, 0, 0))
-        speed_text = font.render(f"{int(speed_kmh)} km/h", True, (0, 0, 0))
-        fps_text = font.render(f"FPS: {int(clock.get_fps())}", True, (0, 255, 0))
-        coin_text = coin_font.render(f"{coin_score}", True, (255, 215, 0))
-
-        screen.blit(dist_text, ((WIDTH / 2) - (dist_text.get_width() / 2), 40))
-        screen.blit(speed_text, ((WIDTH / 2) - (speed_text.get_width() / 2), 104))
-        screen.blit(coin_icon, (20, 20))
-        screen.blit(coin_text, (88, 24))
-        screen.blit(fps_text, (WIDTH - 150, 10))
-
-        screen.blit(gas_icon_ui, (34, 110))
-        pygame.draw.rect(screen, (0, 0, 0), (94, 120, fuel_bar_width + 4, 36))
+        dist_text = f"{int(distance_traveled)} m"
+        speed_text = f"{int(speed_kmh)} km/h"
+        dist_atlas.draw(
+            hud, dist_text, (hud_w // 2 - dist_atlas.width(dist_text) // 2, hs(40))
+        )
+        speed_atlas.draw(
+            hud, speed_text, (hud_w // 2 - speed_atlas.width(speed_text) // 2, hs(104))
+        )
+        hud.blit(hud_coin_icon, (hs(20), hs(20)))
+        coin_atlas.draw(hud, str(coin_score), (hs(88), hs(24)))
+        fps_atlas.draw(hud, f"FPS: {int(clock.get_fps())}", (hud_w - hs(150), hs(10)))
+
+        hud.blit(hud_gas_icon, (hs(34), hs(110)))
+        pygame.draw.rect(
+            hud, (0, 0, 0), (hs(94), hs(120), hs(fuel_bar_width + 4), hs(36))
+        )
         pygame.draw.rect(
-            screen,
+            hud,
             (255, 50, 50),
-            (96, 122, int((fuel / 100) * fuel_bar_width), 32),
+            (hs(96), hs(122), hs((fuel / 100) * fuel_bar_width), hs(32)),
         )
+        if prof:
+            prof.mark("hud")
+            if show_profiler:
+                prof.draw_overlay(hud, profiler_font, (hs(20), hs(180)))
+                prof.mark("overlay")
+        if scaled and not native_layer:
+            pygame.transform.scale(screen, display.get_size(), display)
+            if prof:
+                prof.mark("scale")
+        if not HEADLESS:
+            pygame.display.flip()
+            frame_dt = min(clock.tick(max_fps) / 1000, max_frame_dt)
+        if prof:
+            prof.mark("present")
+            prof.end()
+
+    if scaled:
+        set_render_target(display)
+    if game_over_reason is not None:
+        return game_over_reason
+    if not running:
+        quit_game()
+    return None
+
+
+def make_autopilot(cruise_speed=speed_limit):
+    """Controls that drive right at up to cruise_speed px/s.
+
+    Near the ground it holds throttle below cruise_speed; in the air it
+    uses the keys to keep the car level instead of spinning it.
+    """
 
-        for ftext in floating_texts[:]:
-            alpha = int(255 * (ftext["timer"] / 1.5))
-            if alpha < 0:
-                alpha = 0
-            surf = collect_font.render(ftext["text"], True, ftext["color"])
-            surf.set_alpha(alpha)
-            screen.blit(surf, (ftext["x"] - cam_x, ftext["y"] - cam_y))
-            ftext["y"] -= 40 * dt  # float upward
-            ftext["timer"] -= dt
-            if ftext["timer"] <= 0:
-                floating_texts.remove(ftext)
+    def controls():
+        x, y = player_car.position
+        if track_y(x) - y > 60:
+            tilt = (player_car.angle + math.pi) % (2 * math.pi) - math.pi
+            if tilt > 0.2:
+                return INPUT_RIGHT
+            if tilt < -0.2:
+                return INPUT_LEFT
+            return 0
+        return INPUT_RIGHT if player_car.velocity.x < cruise_speed else 0
+
+    return controls
+
+
+def last_recording():
+    """The run that just ended, as a Recording."""
+    return Recording(run_seed, input_log, selected_car_index, terrain_seed)
+
+
+def replay_recording(rec, render=False):
+    """Play a Recording back through game_loop and report the result."""
+    global selected_car_index, terrain_seed
+    selected_car_index = rec.car_index
+    terrain_seed = rec.terrain_seed
+    start = time.perf_counter()
+    reason = game_loop(
+        ReplayControls(rec.inputs), render=render, max_ticks=len(rec), seed=rec.seed
+    )
+    return run_summary(reason, time.perf_counter() - start)
 
-        pygame.display.flip()
-        clock.tick(60)
 
-    pygame.quit()
+def run_headless(seconds=600, controls=None, seed=None):
+    """Simulate one run without a display and report how it went."""
+    if controls is None:
+        controls = make_autopilot()
+    start = time.perf_counter()
+    reason = game_loop(
+        controls, render=False, max_ticks=int(seconds * physics_hz), seed=seed
+    )
+    return run_summary(reason, time.perf_counter() - start)
+
+
+def run_summary(reason, wall):
+    return {
+        "reason": reason,
+        "seed": run_seed,
+        "ticks": len(input_log),
+        "sim_seconds": round(game_time, 3),
+        "wall_seconds": round(wall, 3),
+        "sim_per_wall": round(game_time / wall, 1),
+        "distance": int(distance_traveled),
+        "coins": coin_score,
+        "flips": flip_count,
+        "fuel": round(fuel, 2),
+        "x": round(player_car.position.x, 3),
+    }
+
+
+# ===== SCENES =====
+def run_scenes(seed=None, record=None):
+    """Drive every screen from one flat loop, starting at the main menu.
+
+    A scene is a function that runs its screen until the player leaves
+    it and returns the name of the next one; nothing calls the next
+    screen itself, so the stack stays this deep however many runs a
+    session holds. The confirm-exit prompt is the one screen opened
+    from inside another, as a modal over the paused run. Fonts, text
+    and sprites come from the module caches, shared by every scene.
+    """
+    game_over_reason = None
+    runs = 0
+
+    def game():
+        nonlocal game_over_reason, runs
+        game_over_reason = game_loop(seed=seed)
+        runs += 1
+        if record:
+            # one file per run: FILE.pyhr -> FILE-1.pyhr, FILE-2.pyhr, ...
+            root, ext = os.path.splitext(record)
+            save_recording(f"{root}-{runs}{ext}", last_recording())
+        return "menu" if game_over_reason is None else "game_over"
+
+    scenes = {
+        "menu": main_menu,
+        "car_select": car_selection_menu,
+        "player_select": player_select_menu,
+        "leaderboards": LEADERBOARDS,
+        "game": game,
+        "game_over": lambda: show_game_over(game_over_reason),
+    }
+    scene = "menu"
+    while True:
+        scene = scenes[scene]()
 
 
 # ===== RUN =====
 if __name__ == "__main__":
-    while True:
-        main_menu()
-        game_loop()
+    parser = argparse.ArgumentParser(description="Pyhill")
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        default=HEADLESS,
+        help="simulate one autopilot run without a display",
+    )
+    parser.add_argument(
+        "--seconds", type=float, default=600, help="headless simulated seconds"
+    )
+    parser.add_argument("--seed", type=int, help="seed for every run")
+    parser.add_argument(
+        "--record",
+        metavar="FILE",
+        help="save each run's inputs, numbered FILE-1, FILE-2, ... in the game",
+    )
+    parser.add_argument("--replay", metavar="FILE", help="play back a recording")
+    parser.add_argument(
+        "--profile-log", metavar="FILE", help="append per-frame stage timings"
+    )
+    parser.add_argument(
+        "--render-scale",
+        type=float,
+        default=render_scale,
+        help="internal resolution as a fraction of the screen's",
+    )
+    parser.add_argument(
+        "--render-size", metavar="WxH", help="fixed internal resolution"
+    )
+    parser.add_argument(
+        "--native-hud",
+        action="store_true",
+        default=native_hud,
+        help="draw the in-game HUD at screen resolution",
+    )
+    parser.add_argument(
+        "--store",
+        choices=("json", "sqlite"),
+        default=store_backend,
+        help="where players and runs are kept",
+    )
+    args = parser.parse_args()
+    store_backend = args.store
+    if not 0 < args.render_scale <= 1:
+        parser.error("--render-scale must be above 0 and at most 1")
+    render_scale = args.render_scale
+    if args.render_size:
+        try:
+            render_size = tuple(int(v) for v in args.render_size.split("x"))
+        except ValueError:
+            render_size = ()
+        if len(render_size) != 2 or min(render_size) <= 0:
+            parser.error(
+                f"--render-size {args.render_size!r} is not WxH, e.g. 1280x720"
+            )
+    native_hud = args.native_hud
+
+    if args.profile_log:
+        profile_log = open(args.profile_log, "a")
+
+    init_display(args.headless, background=not args.headless)
+    players = load_players()
+    if args.replay:
+        print(
+            json.dumps(replay_recording(load_recording(args.replay), not args.headless))
+        )
+        quit_game()
+    if args.headless:
+        print(json.dumps(run_headless(args.seconds, seed=args.seed)))
+        if args.record:
+            save_recording(args.record, last_recording())
+        quit_game()
+    run_scenes(args.seed, args.record)
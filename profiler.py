@@ -0,0 +1,121 @@
+import json
+from collections import deque
+from time import perf_counter_ns
+
+import pygame
+
+# game_loop stages in frame order, with their overlay colours
+STAGES = (
+    ("input", (200, 200, 200)),
+    ("drive", (255, 160, 60)),
+    ("gas_spawn", (255, 90, 90)),
+    ("physics", (90, 160, 255)),
+    ("track", (60, 200, 200)),
+    ("coins", (255, 215, 0)),
+    ("clouds", (235, 235, 255)),
+    ("gas", (200, 60, 60)),
+    ("camera", (150, 150, 150)),
+    ("sky", (135, 206, 235)),
+    ("terrain", (139, 69, 19)),
+    ("sprites", (60, 160, 60)),
+    ("texts", (180, 90, 220)),
+    ("scale", (120, 200, 120)),
+    ("hud", (255, 255, 255)),
+    ("overlay", (90, 90, 90)),
+    ("present", (40, 40, 40)),
+)
+STAGE_COLORS = dict(STAGES)
+DRAW_STAGES = ("sky", "terrain", "sprites", "texts", "scale", "hud", "overlay")
+FRAME_BUDGET_NS = 1_000_000_000 // 60
+
+
+class FrameProfiler:
+    """Per-stage frame timings taken with perf_counter_ns.
+
+    Call start() at the top of a frame, mark(stage) after each stage and
+    end() once the frame is presented. Each mark charges the time since
+    the previous mark to `stage`. Finished frames are kept in `frames` as
+    {stage: ns} dicts, with the whole frame under "frame"; pass history
+    to keep only that many recent frames. A sink file gets one JSON line
+    per frame.
+    """
+
+    def __init__(self, history=None, sink=None):
+        self.frames = [] if history is None else deque(maxlen=history)
+        self.sink = sink
+        self._panel = None
+        self._cur = None
+        self._t0 = self._t = 0
+
+    def start(self):
+        self._cur = {}
+        self._t0 = self._t = perf_counter_ns()
+
+    def mark(self, stage):
+        now = perf_counter_ns()
+        cur = self._cur
+        cur[stage] = cur.get(stage, 0) + now - self._t
+        self._t = now
+
+    def end(self):
+        now = perf_counter_ns()
+        self._cur["frame"] = now - self._t0
+        self.frames.append(self._cur)
+        if self.sink is not None:
+            self.sink.write(json.dumps(self._cur) + "\n")
+        self._cur = None
+
+    def averages(self):
+        """Mean ns per stage over the kept frames."""
+        totals = {}
+        for frame in self.frames:
+            for stage, ns in frame.items():
+                totals[stage] = totals.get(stage, 0) + ns
+        n = max(1, len(self.frames))
+        return {stage: ns / n for stage, ns in totals.items()}
+
+    def worst(self):
+        """The slowest kept frame."""
+        return max(self.frames, key=lambda f: f["frame"], default={})
+
+    def draw_overlay(self, surface, font, pos=(20, 180)):
+        """Rolling averages per stage plus stacked bars for the mean and worst frame."""
+        x, y = pos
+        avg = self.averages()
+        worst = self.worst()
+        bar_w, bar_h = 400, 16
+        scale = bar_w / (2 * FRAME_BUDGET_NS)  # the bar spans two frame budgets
+
+        if self._panel is None:
+            self._panel = pygame.Surface(
+                (bar_w + 240, 90 + 20 * len(STAGES)), pygame.SRCALPHA
+            )
+            self._panel.fill((0, 0, 0, 160))
+        surface.blit(self._panel, (x - 10, y - 10))
+
+        for label, frame in (("avg", avg), ("worst", worst)):
+            total = frame.get("frame", 0)
+            text = font.render(f"{label} {total / 1e6:5.2f} ms", True, (255, 255, 255))
+            surface.blit(text, (x, y))
+            bx = x + 200
+            for stage, color in STAGES:
+                w = frame.get(stage, 0) * scale
+                if w >= 1:
+                    pygame.draw.rect(surface, color, (bx, y + 4, w, bar_h))
+                    bx += w
+            budget_x = x + 200 + FRAME_BUDGET_NS * scale
+            pygame.draw.line(
+                surface, (255, 0, 0), (budget_x, y), (budget_x, y + bar_h + 8), 2
+            )
+            y += 30
+
+        for stage, color in STAGES:
+            pygame.draw.rect(surface, color, (x, y + 4, 12, 12))
+            text = font.render(
+                f"{stage} {avg.get(stage, 0) / 1e6:.2f} / "
+                f"{worst.get(stage, 0) / 1e6:.2f}",
+                True,
+                (255, 255, 255),
+            )
+            surface.blit(text, (x + 20, y))
+            y += 20
@@ -0,0 +1,57 @@
+import struct
+
+MAGIC = b"PYHR"
+VERSION = 1
+# magic, version, run seed, terrain seed (-1 for the classic hills), car index
+_HEADER = struct.Struct("<4sBqqB")
+
+
+class Recording:
+    """Everything needed to replay a run: its seeds, car and per-tick inputs.
+
+    `inputs` holds one INPUT_* bitmask byte per simulated tick.
+    """
+
+    def __init__(self, seed, inputs=b"", car_index=0, terrain_seed=None):
+        self.seed = seed
+        self.inputs = bytearray(inputs)
+        self.car_index = car_index
+        self.terrain_seed = terrain_seed
+
+    def __len__(self):
+        return len(self.inputs)
+
+
+def save_recording(path, rec):
+    terrain_seed = -1 if rec.terrain_seed is None else rec.terrain_seed
+    header = _HEADER.pack(MAGIC, VERSION, rec.seed, terrain_seed, rec.car_index)
+    with open(path, "wb") as f:
+        f.write(header)
+        f.write(rec.inputs)
+
+
+def load_recording(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, seed, terrain_seed, car_index = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a pyhill recording")
+    return Recording(
+        seed,
+        data[_HEADER.size :],
+        car_index,
+        None if terrain_seed < 0 else terrain_seed,
+    )
+
+
+class ReplayControls:
+    """A game_loop controls() callable that plays back recorded inputs."""
+
+    def __init__(self, inputs):
+        self.inputs = inputs
+        self.tick = 0
+
+    def __call__(self):
+        bits = self.inputs[self.tick] if self.tick < len(self.inputs) else 0
+        self.tick += 1
+        return bits
@@ -0,0 +1,68 @@
+from entities import Cloud
+
+
+class Sky:
+    """Parallax cloud layers drawn from a fixed pool of pre-scaled images.
+
+    `variants` are (scale, surface) pairs made once per session. Of
+    `layers` layers, far to near, layer i scrolls at (i + 1) / layers of
+    max_parallax and takes the i-th band of scales, so nearer clouds are
+    bigger and faster. Each layer keeps `density` clouds per screen width
+    spread over `span` screens; a cloud that drifts off the left moves
+    one span to the right with a new variant and height, so recycling
+    neither allocates nor resamples anything.
+    """
+
+    def __init__(
+        self, variants, width, layers=1, density=2.0, span=4, max_parallax=0.3
+    ):
+        self.width = width
+        self.density = density
+        self.max_parallax = max_parallax
+        self.span = width * span
+        scales = sorted({scale for scale, _ in variants})
+        n = len(scales)
+        self.layers = []  # (parallax, images, clouds), far to near
+        for i in range(layers):
+            lo = min(i * n // layers, n - 1)
+            band = scales[lo : max(lo + 1, (i + 1) * n // layers)]
+            images = [img for scale, img in variants if scale in band]
+            count = max(1, round(density * span))
+            clouds = [Cloud(0.0, 0, 0.0, images[0]) for _ in range(count)]
+            self.layers.append((max_parallax * (i + 1) / layers, images, clouds))
+
+    def __len__(self):
+        return sum(len(clouds) for _, _, clouds in self.layers)
+
+    def reset(self, rng):
+        """Scatter every cloud across the span again."""
+        for parallax, images, clouds in self.layers:
+            for cloud in clouds:
+                cloud.img = rng.choice(images)
+                cloud.x = rng.randint(0, self.span)
+                cloud.y = rng.randint(40, 260)
+                # slower = more natural, and slower still further back
+                cloud.speed = rng.uniform(0.1, 0.35) * parallax / self.max_parallax
+
+    def update(self, rng, cam_x):
+        """Drift the clouds one tick and recycle those left behind."""
+        for parallax, images, clouds in self.layers:
+            left = cam_x * parallax
+            for cloud in clouds:
+                cloud.x -= cloud.speed
+                if cloud.x - left < -cloud.img.get_width():
+                    cloud.x += self.span
+                    cloud.y = rng.randint(40, 260)
+                    cloud.img = rng.choice(images)
+
+    def draw(self, surface, view_x):
+        """Blit the clouds that are on screen, far layers first."""
+        width = surface.get_width()
+        seq = []
+        for parallax, _, clouds in self.layers:
+            dx = view_x * parallax
+            for cloud in clouds:
+                x = cloud.x - dx
+                if x < width and x > -cloud.img.get_width():
+                    seq.append((cloud.img, (x, cloud.y)))
+        surface.blits(seq, doreturn=False)
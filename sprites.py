@@ -0,0 +1,51 @@
+from collections import OrderedDict
+
+import pygame
+
+
+class RotationCache:
+    """An image pre-rotated at every `step` degrees.
+
+    get(angle) snaps the angle to the nearest step and returns the rotated
+    surface, rotating it the first time that step is asked for. Rotations
+    are kept until they exceed `budget_mb` of pixel data, after which the
+    least recently used ones are dropped. prebuild() fills the cache up
+    front so the first lap doesn't pay for the rotations.
+    """
+
+    def __init__(self, image, step=2, budget_mb=32):
+        self.image = image
+        self.step = step
+        self.count = max(1, round(360 / step))
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.bytes = 0
+        self._frames = OrderedDict()
+
+    def __len__(self):
+        return len(self._frames)
+
+    def _rotate(self, k):
+        surf = pygame.transform.rotate(self.image, k * 360 / self.count)
+        self._frames[k] = surf
+        self.bytes += surf.get_pitch() * surf.get_height()
+        while self.bytes > self.budget and len(self._frames) > 1:
+            _, old = self._frames.popitem(last=False)
+            self.bytes -= old.get_pitch() * old.get_height()
+        return surf
+
+    def get(self, angle):
+        """The image rotated counter-clockwise by `angle` degrees."""
+        k = round(angle * self.count / 360) % self.count
+        surf = self._frames.get(k)
+        if surf is None:
+            return self._rotate(k)
+        self._frames.move_to_end(k)
+        return surf
+
+    def prebuild(self):
+        """Rotate every step that fits in the budget."""
+        for k in range(self.count):
+            if k not in self._frames:
+                self._rotate(k)
+                if self.bytes >= self.budget:
+                    break
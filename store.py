@@ -0,0 +1,560 @@
+import heapq
+import json
+import os
+import sqlite3
+
+from leaderboard import TopRuns
+from writer import Writer
+
+SUMMARY_VERSION = 1
+SCHEMA_VERSION = 1
+
+# fsync policies: "always" syncs every write batch, "summary" only when
+# the summary is rewritten (the log can lose its last runs on power loss,
+# never its history), "never" leaves it all to the OS
+FSYNC_POLICIES = ("always", "summary", "never")
+SQLITE_SYNCHRONOUS = {"always": "FULL", "summary": "NORMAL", "never": "OFF"}
+
+SCHEMA = (
+    """CREATE TABLE players (
+        name TEXT PRIMARY KEY,
+        max_distance INTEGER NOT NULL DEFAULT 0,
+        coins INTEGER NOT NULL DEFAULT 0,
+        flips INTEGER NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE runs (
+        id INTEGER PRIMARY KEY,
+        player TEXT NOT NULL,
+        distance INTEGER NOT NULL,
+        coins INTEGER NOT NULL,
+        flips INTEGER NOT NULL,
+        time TEXT NOT NULL
+    )""",
+    "CREATE INDEX runs_distance ON runs (distance DESC, id)",
+    "CREATE INDEX runs_coins ON runs (coins DESC, id)",
+    "CREATE INDEX runs_flips ON runs (flips DESC, id)",
+    "CREATE INDEX runs_player ON runs (player, distance DESC, id)",
+    "CREATE INDEX players_distance ON players (max_distance DESC)",
+    "CREATE INDEX players_coins ON players (coins DESC)",
+    "CREATE INDEX players_flips ON players (flips DESC)",
+)
+
+# leaderboard keys: run field -> player stat holding its best
+STAT_KEYS = {"distance": "Max Distance", "coins": "Coins", "flips": "Flips"}
+
+
+def _dumps(obj):
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def atomic_write(path, data, fsync=True):
+    """Replace `path` with `data` (bytes) so readers only ever see old or new."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def new_stats():
+    return {"Max Distance": 0, "Coins": 0, "Flips": 0}
+
+
+def _legacy_records(legacy):
+    """Log records for a players dict with embedded "Runs" lists."""
+    for name, stats in legacy.items():
+        yield {"type": "player", "player": name}
+        for run in reversed(stats.get("Runs", [])):  # stored newest first
+            yield {"type": "run", "player": name, **run}
+
+
+class PlayerStore:
+    """Players' bests in a small summary file plus an append-only run log.
+
+    Every new player and every run is one JSON line appended to the log,
+    so saving costs the same however much history there is. The summary
+    holds each player's bests and the log offset it covers; it is
+    rewritten atomically every `compact_every` records. Loading reads the
+    summary and replays only the log past that offset. A torn last line
+    from a crash mid-append is cut off; a garbled complete line is skipped.
+
+    The `top_capacity` best runs by distance and the run count are kept
+    in the summary too and updated as runs are applied, so the distance
+    leaderboard never has to read the log.
+
+    The old single-file format (players with a "Runs" list) is migrated
+    on first load.
+
+    With `background` the file writes go through a Writer thread: the
+    in-memory state updates at once, queued log lines are appended in
+    one write and only the newest queued summary is written.
+    """
+
+    def __init__(
+        self,
+        summary_path,
+        log_path,
+        compact_every=20,
+        top_capacity=1000,
+        background=False,
+        fsync="always",
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"unknown fsync policy {fsync!r}")
+        self.summary_path = summary_path
+        self.log_path = log_path
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.writer = Writer(self._write_batch) if background else None
+        self.players = {}
+        self.top = TopRuns(top_capacity)
+        self.run_total = 0
+        self.log_offset = 0  # bytes of log covered by the summary
+        self.log_size = 0
+        self.pending = 0  # records appended since the last compaction
+
+    # ===== LOADING =====
+    def _read_summary(self):
+        """The summary file's contents, or None if missing or unreadable."""
+        if not os.path.exists(self.summary_path):
+            return None
+        try:
+            with open(self.summary_path, "rb") as f:
+                summary = json.load(f)
+        except ValueError:
+            return None
+        return summary if isinstance(summary, dict) else None
+
+    def load(self):
+        """Read the summary and replay the log tail; returns the players dict."""
+        summary = self._read_summary()
+        if summary is not None and summary.get("version") == SUMMARY_VERSION:
+            self.players = summary["players"]
+            self.log_offset = summary["log_offset"]
+            if "top_runs" in summary:
+                self.top.extend(summary["top_runs"])
+                self.run_total = summary["run_count"]
+            else:  # written before the top runs were kept
+                for run in self.runs(end=self.log_offset):
+                    self.top.add(run)
+                    self.run_total += 1
+        elif summary:
+            self._migrate(summary)
+            return self.players
+
+        self.log_size = self._replay(self.log_offset)
+        # a summary claiming log that was lost would hide the runs appended
+        # over those bytes from the next load, so it is replaced at once
+        if self.pending >= self.compact_every or self.log_offset > self.log_size:
+            self.compact()
+        return self.players
+
+    def _replay(self, offset):
+        """Apply log records from `offset` on; returns the good end of the log."""
+        if not os.path.exists(self.log_path):
+            return 0
+        with open(self.log_path, "rb+") as f:
+            # a summary can claim more log than survived a crash; whatever was
+            # appended since starts at the last line break before its offset
+            offset = min(offset, f.seek(0, os.SEEK_END))
+            f.seek(max(offset - 1, 0))
+            if offset and f.read(1) != b"\n":
+                f.seek(0)
+                offset = f.read(offset).rfind(b"\n") + 1
+                f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):  # torn by a crash mid-append
+                    f.truncate(offset)
+                    break
+                offset += len(line)
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                self._apply(rec)
+                self.pending += 1
+        return offset
+
+    def _apply(self, rec):
+        p = self.players.setdefault(rec["player"], new_stats())
+        if rec["type"] == "run":
+            p["Max Distance"] = max(p["Max Distance"], rec["distance"])
+            p["Coins"] = max(p["Coins"], rec["coins"])
+            p["Flips"] = max(p["Flips"], rec["flips"])
+            self.top.add({k: v for k, v in rec.items() if k != "type"})
+            self.run_total += 1
+
+    def _migrate(self, legacy):
+        """Move a players file with embedded "Runs" lists to summary + log."""
+        lines = [_dumps(rec) for rec in _legacy_records(legacy)]
+        data = "".join(line + "\n" for line in lines).encode()
+        # the log is replaced, not appended to, so a crash before the summary
+        # is written just means migrating again from the untouched old file
+        atomic_write(self.log_path, data)
+        self.players = {}
+        self.top = TopRuns(self.top.capacity)
+        self.run_total = 0
+        self.log_offset = 0
+        self.log_size = self._replay(0)
+        for name, stats in legacy.items():
+            p = self.players[name]
+            for key in p:
+                p[key] = max(p[key], int(stats.get(key, 0)))
+        self.compact()
+
+    # ===== WRITING =====
+    def _submit(self, job):
+        if self.writer is not None:
+            self.writer.submit(job)
+        else:
+            self._write_batch([job])
+
+    def _write_batch(self, jobs):
+        """Append the queued log lines, then write the newest summary."""
+        lines = b"".join(data for kind, data in jobs if kind == "log")
+        summaries = [data for kind, data in jobs if kind == "summary"]
+        # the log reaches the disk before any summary covering it does
+        sync = self.fsync == "always" or (summaries and self.fsync == "summary")
+        if lines or sync:
+            with open(self.log_path, "ab") as f:
+                f.write(lines)
+                if sync:
+                    f.flush()
+                    os.fsync(f.fileno())
+        if summaries:
+            data = _dumps(summaries[-1]).encode()
+            atomic_write(self.summary_path, data, self.fsync != "never")
+
+    def _append(self, rec):
+        line = (_dumps(rec) + "\n").encode()
+        self._submit(("log", line))
+        self.log_size += len(line)
+        self._apply(rec)
+        self.pending += 1
+        if self.pending >= self.compact_every:
+            self.compact()
+
+    def add_player(self, name):
+        if name not in self.players:
+            self._append({"type": "player", "player": name})
+        return self.players[name]
+
+    def record_run(self, name, distance, coins, flips, time):
+        self._append(
+            {
+                "type": "run",
+                "player": name,
+                "distance": int(distance),
+                "coins": int(coins),
+                "flips": int(flips),
+                "time": time,
+            }
+        )
+
+    def compact(self):
+        """Rewrite the summary to cover the whole log."""
+        # a snapshot, so the writer can serialize it while play goes on
+        summary = {
+            "version": SUMMARY_VERSION,
+            "log_offset": self.log_size,
+            "players": {name: dict(st) for name, st in self.players.items()},
+            "run_count": self.run_total,
+            "top_runs": list(self.top.runs),
+        }
+        self._submit(("summary", summary))
+        self.log_offset = self.log_size
+        self.pending = 0
+
+    def flush(self):
+        """Wait for queued writes to reach the files."""
+        if self.writer is not None:
+            self.writer.flush()
+
+    def close(self):
+        """Write the summary if anything was logged since the last one."""
+        try:
+            if self.pending:
+                self.compact()
+        finally:
+            if self.writer is not None:
+                self.writer.close()
+
+    # ===== READING =====
+    def _records(self, end=None):
+        """Every whole record in the first `end` bytes of the log (or all)."""
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, "rb") as f:
+            offset = 0
+            for line in f:
+                offset += len(line)
+                if not line.endswith(b"\n") or (end is not None and offset > end):
+                    break
+                try:
+                    yield json.loads(line)
+                except ValueError:  # a record garbled by a crash; load skips it too
+                    continue
+
+    def runs(self, end=None):
+        """Every recorded run, oldest first, as {"player", "distance", ...} dicts.
+
+        With `end`, only runs in the first `end` bytes of the log.
+        """
+        self.flush()
+        for rec in self._records(end):
+            if rec.pop("type") == "run":
+                yield rec
+
+    def export(self):
+        """(players, runs) as load() and runs() would give them, read-only.
+
+        Nothing is migrated, truncated or compacted, so the files are left
+        exactly as they were; SqlitePlayerStore imports through this.
+        """
+        summary = self._read_summary()
+        players = {}
+        if summary is None:
+            records = self._records()
+        elif summary.get("version") == SUMMARY_VERSION:
+            players = {name: dict(st) for name, st in summary["players"].items()}
+            records = self._records()
+        else:  # the old single file, runs and all
+            records = _legacy_records(summary)
+        runs = []
+        for rec in records:
+            p = players.setdefault(rec["player"], new_stats())
+            if rec.pop("type") == "run":
+                p["Max Distance"] = max(p["Max Distance"], rec["distance"])
+                p["Coins"] = max(p["Coins"], rec["coins"])
+                p["Flips"] = max(p["Flips"], rec["flips"])
+                runs.append(rec)
+        if summary is not None and summary.get("version") != SUMMARY_VERSION:
+            for name, stats in summary.items():
+                p = players[name]
+                for key in p:
+                    p[key] = max(p[key], int(stats.get(key, 0)))
+        return players, runs
+
+    def run_count(self):
+        return self.run_total
+
+    def top_runs(self, key="distance", limit=10, offset=0, player=None):
+        """Runs with the highest `key`, best first, for one player or everyone.
+
+        Distance pages inside the kept top runs are answered without
+        reading the log.
+        """
+        top = self.top
+        if (
+            key == top.key
+            and player is None
+            and (offset + limit <= len(top) or len(top) == self.run_total)
+        ):
+            return top.page(offset, limit)
+        runs = self.runs()
+        if player is not None:
+            runs = (r for r in runs if r["player"] == player)
+        return heapq.nlargest(offset + limit, runs, key=lambda r: r[key])[offset:]
+
+    def top_players(self, key="distance", limit=10, offset=0):
+        """(name, stats) pairs ordered by the player's best `key`."""
+        stat = STAT_KEYS[key]
+        ranked = heapq.nlargest(
+            offset + limit, self.players.items(), key=lambda p: p[1][stat]
+        )
+        return ranked[offset:]
+
+
+class SqlitePlayerStore:
+    """PlayerStore's interface on a SQLite database.
+
+    Runs are rows indexed by distance, coins and flips (and by player and
+    distance), so top-N queries and paging read only the rows they return
+    instead of the whole history. Players' bests are kept in their own
+    table, updated in the same transaction as each run. `players` mirrors
+    that table in memory for the menus.
+
+    A new database can be seeded from a JSON PlayerStore, read without
+    changing its files; the import and the schema are committed together,
+    so an interrupted migration simply runs again on the next launch.
+
+    With `background` writes run on a Writer thread with a connection of
+    their own; queued records are committed in one transaction. Queries
+    wait for queued writes first, so they always see every recorded run.
+    """
+
+    def __init__(self, path, background=False, fsync="always"):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"unknown fsync policy {fsync!r}")
+        self.path = path
+        self.fsync = fsync
+        self.db = None
+        self.write_db = None  # self.db, or the writer thread's connection
+        self.writer = Writer(self._write_batch) if background else None
+        self.players = {}
+        self.run_total = 0
+
+    # ===== LOADING =====
+    def load(self, legacy=None):
+        """Open (creating or migrating) the database; returns the players dict.
+
+        `legacy` is an unloaded PlayerStore imported when the database is new.
+        """
+        self.db = self._connect()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        if self.writer is None:
+            self.write_db = self.db
+        if self.db.execute("PRAGMA user_version").fetchone()[0] == 0:
+            self.db.execute("BEGIN")
+            self._create()
+            if legacy is not None:
+                self._import(legacy)
+            self.db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            self.db.execute("COMMIT")
+
+        self.players = {
+            name: {"Max Distance": d, "Coins": c, "Flips": f}
+            for name, d, c, f in self.db.execute(
+                "SELECT name, max_distance, coins, flips FROM players ORDER BY rowid"
+            )
+        }
+        self.run_total = self.db.execute("SELECT count(*) FROM runs").fetchone()[0]
+        return self.players
+
+    def _connect(self, **kwargs):
+        db = sqlite3.connect(self.path, isolation_level=None, **kwargs)
+        db.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS[self.fsync]}")
+        return db
+
+    def _create(self):
+        for statement in SCHEMA:
+            self.db.execute(statement)
+
+    def _import(self, legacy):
+        players, runs = legacy.export()
+        self.db.executemany(
+            "INSERT INTO players VALUES (?, ?, ?, ?)",
+            (
+                (name, st["Max Distance"], st["Coins"], st["Flips"])
+                for name, st in players.items()
+            ),
+        )
+        self.db.executemany(
+            "INSERT INTO runs (player, distance, coins, flips, time) "
+            "VALUES (:player, :distance, :coins, :flips, :time)",
+            runs,
+        )
+
+    # ===== WRITING =====
+    def _submit(self, job):
+        if self.writer is not None:
+            self.writer.submit(job)
+        else:
+            self._write_batch([job])
+
+    def _write_batch(self, jobs):
+        """Commit queued jobs in one transaction."""
+        if self.write_db is None:
+            # opened on the writer thread; closed from the caller's
+            self.write_db = self._connect(check_same_thread=False)
+        db = self.write_db
+        with db:
+            db.execute("BEGIN")
+            for kind, data in jobs:
+                if kind == "player":
+                    db.execute("INSERT OR IGNORE INTO players (name) VALUES (?)", data)
+                elif kind == "run":
+                    db.execute(
+                        "INSERT INTO runs (player, distance, coins, flips, time) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        data,
+                    )
+                    db.execute(
+                        "INSERT INTO players VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (name) DO UPDATE "
+                        "SET max_distance = max(max_distance, excluded.max_distance), "
+                        "coins = max(coins, excluded.coins), "
+                        "flips = max(flips, excluded.flips)",
+                        data[:4],
+                    )
+
+    def add_player(self, name):
+        if name not in self.players:
+            self._submit(("player", (name,)))
+            self.players[name] = new_stats()
+        return self.players[name]
+
+    def record_run(self, name, distance, coins, flips, time):
+        distance, coins, flips = int(distance), int(coins), int(flips)
+        self._submit(("run", (name, distance, coins, flips, time)))
+        self.run_total += 1
+        p = self.players.setdefault(name, new_stats())
+        p["Max Distance"] = max(p["Max Distance"], distance)
+        p["Coins"] = max(p["Coins"], coins)
+        p["Flips"] = max(p["Flips"], flips)
+
+    def flush(self):
+        """Wait for queued writes to be committed."""
+        if self.writer is not None:
+            self.writer.flush()
+
+    def close(self):
+        try:
+            if self.writer is not None:
+                self.writer.close()
+        finally:
+            if self.write_db is not None and self.write_db is not self.db:
+                self.write_db.close()
+            self.write_db = None
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+    # ===== READING =====
+    def _run_dicts(self, rows):
+        return [
+            {"player": p, "distance": d, "coins": c, "flips": f, "time": t}
+            for p, d, c, f, t in rows
+        ]
+
+    def runs(self):
+        """Every recorded run, oldest first."""
+        self.flush()
+        cur = self.db.execute(
+            "SELECT player, distance, coins, flips, time FROM runs ORDER BY id"
+        )
+        for rows in iter(lambda: cur.fetchmany(1000), []):
+            yield from self._run_dicts(rows)
+
+    def run_count(self):
+        return self.run_total
+
+    def top_runs(self, key="distance", limit=10, offset=0, player=None):
+        """Runs with the highest `key`, best first, for one player or everyone."""
+        if key not in STAT_KEYS:
+            raise ValueError(f"unknown leaderboard key {key!r}")
+        self.flush()
+        where = "WHERE player = ?" if player is not None else ""
+        args = (player,) if player is not None else ()
+        rows = self.db.execute(
+            "SELECT player, distance, coins, flips, time FROM runs "
+            f"{where} ORDER BY {key} DESC, id LIMIT ? OFFSET ?",
+            args + (limit, offset),
+        )
+        return self._run_dicts(rows)
+
+    def top_players(self, key="distance", limit=10, offset=0):
+        """(name, stats) pairs ordered by the player's best `key`."""
+        column = {"distance": "max_distance", "coins": "coins", "flips": "flips"}[key]
+        self.flush()
+        rows = self.db.execute(
+            "SELECT name, max_distance, coins, flips FROM players "
+            f"ORDER BY {column} DESC, rowid LIMIT ? OFFSET ?",
+            (limit, offset),
+        )
+        return [
+            (name, {"Max Distance": d, "Coins": c, "Flips": f})
+            for name, d, c, f in rows
+        ]
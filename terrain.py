@@ -0,0 +1,274 @@
+import math
+from array import array
+from bisect import bisect_right
+from collections import deque
+from itertools import pairwise
+
+import pygame
+import pymunk
+
+from lru import LRUCache
+
+CHUNK_SEGMENTS = 32
+
+
+class TrackStore:
+    """Track points kept in contiguous x/y arrays with a moving base offset.
+
+    Dropping points from the front only advances `base`; the dead prefix is
+    compacted away once it outgrows the live points, so trimming is
+    amortised O(1). xs is sorted, so range lookups are a bisect.
+    """
+
+    def __init__(self):
+        self.xs = array("d")
+        self.ys = array("d")
+        self.base = 0
+
+    def __len__(self):
+        return len(self.xs) - self.base
+
+    def __getitem__(self, i):
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("track index out of range")
+        j = self.base + i
+        return self.xs[j], self.ys[j]
+
+    def extend(self, pts):
+        for x, y in pts:
+            self.xs.append(x)
+            self.ys.append(y)
+
+    def drop_front(self, n):
+        self.base = min(self.base + n, len(self.xs))
+        if self.base > len(self.xs) - self.base:
+            del self.xs[: self.base]
+            del self.ys[: self.base]
+            self.base = 0
+
+    def index_range(self, x0, x1):
+        """Live indices [i, j) of the points spanning x0..x1.
+
+        The range includes the last point at or before x0 and the first
+        point after x1, so the segments crossing either edge are covered.
+        """
+        end = len(self.xs)
+        lo = max(self.base, bisect_right(self.xs, x0, self.base, end) - 1)
+        hi = min(end, bisect_right(self.xs, x1, self.base, end) + 1)
+        return lo - self.base, max(lo, hi) - self.base
+
+    def between(self, x0, x1):
+        """List of (x, y) points spanning x0..x1, see index_range."""
+        i, j = self.index_range(x0, x1)
+        i += self.base
+        j += self.base
+        return list(zip(self.xs[i:j], self.ys[i:j]))
+
+
+class Terrain:
+    """Track points and their static pymunk segments, managed in chunks.
+
+    Terrain is generated a chunk at a time and each chunk's segments are
+    added to the space in one batch. Chunks that fall behind the car are
+    removed the same way and their Segment objects are pooled for reuse by
+    the next chunk ahead, so the shape count stays flat for the whole run.
+    """
+
+    def __init__(
+        self,
+        space,
+        heightfield,
+        step=30,
+        chunk_segments=CHUNK_SEGMENTS,
+        radius=4,
+        friction=1.0,
+        elasticity=0.1,
+    ):
+        self.space = space
+        self.heightfield = heightfield
+        self.step = step
+        self.chunk_segments = chunk_segments
+        self.radius = radius
+        self.friction = friction
+        self.elasticity = elasticity
+
+        self.points = TrackStore()
+        self.chunks = deque()  # (start_x, end_x, segments)
+        self.next_x = 0
+        self._pool = []
+
+    @property
+    def end_x(self):
+        return self.points[-1][0] if self.points else self.next_x
+
+    @property
+    def shape_count(self):
+        return sum(len(segs) for _, _, segs in self.chunks)
+
+    def _segment(self, a, b):
+        if self._pool:
+            seg = self._pool.pop()
+            seg.unsafe_set_endpoints(a, b)
+            return seg
+        seg = pymunk.Segment(self.space.static_body, a, b, self.radius)
+        seg.friction = self.friction
+        seg.elasticity = self.elasticity
+        return seg
+
+    def add_chunk(self):
+        x0 = self.next_x
+        n = self.chunk_segments
+        xs = [x0 + i * self.step for i in range(n + 1)]
+        pts = list(zip(xs, self.heightfield.heights(xs).tolist()))
+
+        segs = [self._segment(pts[i], pts[i + 1]) for i in range(n)]
+        self.space.add(*segs)
+        self.chunks.append((x0, pts[-1][0], segs))
+
+        # neighbouring chunks share their boundary point
+        self.points.extend(pts[1:] if self.points else pts)
+        self.next_x = pts[-1][0]
+
+    def extend_to(self, x):
+        """Generate chunks until the track reaches at least x."""
+        while self.end_x < x:
+            self.add_chunk()
+
+    def retire_before(self, x):
+        """Remove every chunk that ends before x from the space."""
+        dropped = 0
+        while len(self.chunks) > 1 and self.chunks[0][1] < x:
+            _, _, segs = self.chunks.popleft()
+            self.space.remove(*segs)
+            self._pool.extend(segs)
+            dropped += len(segs)
+        if dropped:
+            self.points.drop_front(dropped)
+            self.heightfield.trim(self.chunks[0][0])
+
+
+# ===== RENDERING =====
+def draw_terrain_segments(surface, points, cam_x, cam_y, grass_tex, dirt_color):
+    """Reference renderer: one polygon and one rotozoomed grass piece per segment.
+
+    This is how terrain was drawn before chunks were baked; it is kept for
+    comparing output and frame times against TerrainRenderer.
+    """
+    height = surface.get_height()
+    for i in range(len(points) - 1):
+        x1, y1 = points[i]
+        x2, y2 = points[i + 1]
+        poly_pts = [
+            (x1 - cam_x, height),
+            (x1 - cam_x, y1 - cam_y),
+            (x2 - cam_x, y2 - cam_y),
+            (x2 - cam_x, height),
+        ]
+        pygame.draw.polygon(surface, dirt_color, poly_pts)
+        dx, dy = x2 - x1, y2 - y1
+        seg_len = max(1, math.hypot(dx, dy))
+        angle = math.degrees(math.atan2(-dy, dx))
+        piece = pygame.transform.rotozoom(
+            grass_tex, angle, seg_len / grass_tex.get_width()
+        )
+        pos = (x1 - cam_x, y1 - cam_y)
+        surface.blit(piece, piece.get_rect(midleft=pos))
+
+
+class TerrainRenderer:
+    """Draws terrain from per-chunk surfaces baked once and cached LRU-style.
+
+    Each chunk is baked into a band covering its grass edge and the dirt
+    just below it. The dirt under the band is blitted from one shared,
+    pre-tiled wall surface, so a visible chunk costs two blits per frame.
+    Dirt tiles are aligned to world coordinates, so bands, walls and
+    neighbouring chunks line up without seams.
+    """
+
+    def __init__(self, dirt_tex, grass_tex, max_chunks=12):
+        self.dirt_tex = dirt_tex
+        self.grass_tex = grass_tex
+        self.max_chunks = max_chunks
+        self.pad = grass_tex.get_height()
+        # start_x -> (surface, world_x, world_y, dirt_bottom)
+        self._cache = LRUCache(max_chunks)
+        self._wall = None
+
+    def clear(self):
+        self._cache.clear()
+
+    def _tile(self, surface, world_x, world_y):
+        tw, th = self.dirt_tex.get_size()
+        w, h = surface.get_size()
+        for ty in range(-int(world_y % th), h, th):
+            for tx in range(-int(world_x % tw), w, tw):
+                surface.blit(self.dirt_tex, (tx, ty))
+
+    def _bake(self, start_x, end_x, segs):
+        pts = [tuple(segs[0].a)] + [tuple(s.b) for s in segs]
+        ys = [y for _, y in pts]
+        pad = self.pad
+        world_x = start_x - pad
+        world_y = math.floor(min(ys)) - pad
+        dirt_bottom = math.ceil(max(ys)) + pad
+        w = int(end_x - start_x) + 2 * pad
+        h = dirt_bottom - world_y
+
+        band = pygame.Surface((w, h), pygame.SRCALPHA)
+        self._tile(band, world_x, world_y)
+        mask = pygame.Surface((w, h), pygame.SRCALPHA)
+        poly = [(start_x - world_x, h)]
+        poly += [(x - world_x, y - world_y) for x, y in pts]
+        poly.append((end_x - world_x, h))
+        pygame.draw.polygon(mask, (255, 255, 255, 255), poly)
+        band.blit(mask, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
+
+        for (x1, y1), (x2, y2) in pairwise(pts):
+            dx, dy = x2 - x1, y2 - y1
+            seg_len = max(1, math.hypot(dx, dy))
+            angle = math.degrees(math.atan2(-dy, dx))
+            piece = pygame.transform.rotozoom(
+                self.grass_tex, angle, seg_len / self.grass_tex.get_width()
+            )
+            band.blit(piece, piece.get_rect(midleft=(x1 - world_x, y1 - world_y)))
+
+        return band, world_x, world_y, dirt_bottom
+
+    def _get(self, start_x, end_x, segs):
+        return self._cache.get(start_x, lambda _: self._bake(start_x, end_x, segs))
+
+    def draw(self, surface, terrain, cam_x, cam_y):
+        sw, sh = surface.get_size()
+        tw, th = self.dirt_tex.get_size()
+        chunk_w = terrain.chunk_segments * terrain.step
+        if (
+            self._wall is None
+            or self._wall.get_width() < chunk_w + tw
+            or self._wall.get_height() < sh + th
+        ):
+            self._wall = pygame.Surface((chunk_w + tw, sh + th))
+            self._tile(self._wall, 0, 0)
+
+        view_bottom = cam_y + sh
+        for start_x, end_x, segs in terrain.chunks:
+            if end_x < cam_x:
+                continue
+            if start_x > cam_x + sw:
+                break
+            band, world_x, world_y, dirt_bottom = self._get(start_x, end_x, segs)
+
+            wall_top = max(dirt_bottom, math.floor(cam_y))
+            if wall_top < view_bottom:
+                area = pygame.Rect(
+                    int(start_x % tw),
+                    int(wall_top % th),
+                    int(end_x - start_x),
+                    math.ceil(view_bottom - wall_top),
+                )
+                surface.blit(
+                    self._wall, (round(start_x - cam_x), round(wall_top - cam_y)), area
+                )
+            surface.blit(band, (round(world_x - cam_x), round(world_y - cam_y)))
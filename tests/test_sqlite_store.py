@@ -0,0 +1,59 @@
+import json
+
+from store import PlayerStore, SqlitePlayerStore
+
+LEGACY = {
+    "A": {
+        "Max Distance": 120,
+        "Coins": 3,
+        "Flips": 1,
+        "Runs": [
+            {"distance": 90, "coins": 3, "flips": 1, "time": "2025-01-02 12:01"},
+            {"distance": 80, "coins": 2, "flips": 0, "time": "2025-01-02 12:00"},
+        ],
+    },
+    "B": {"Max Distance": 0, "Coins": 0, "Flips": 0, "Runs": []},
+}
+
+
+def test_import_leaves_legacy_files_untouched(tmp_path):
+    summary = tmp_path / "players.json"
+    log = tmp_path / "runs.jsonl"
+    summary.write_text(json.dumps(LEGACY))
+    before = summary.read_bytes()
+
+    store = SqlitePlayerStore(str(tmp_path / "players.db"))
+    players = store.load(PlayerStore(str(summary), str(log)))
+    assert summary.read_bytes() == before
+    assert not log.exists()
+
+    # the best stored in the old file wins over the kept runs
+    assert players["A"] == {"Max Distance": 120, "Coins": 3, "Flips": 1}
+    assert "B" in players
+    assert [r["distance"] for r in store.runs()] == [80, 90]
+    store.close()
+
+
+def test_import_from_summary_and_log(tmp_path):
+    summary = str(tmp_path / "players.json")
+    log = str(tmp_path / "runs.jsonl")
+    json_store = PlayerStore(summary, log, compact_every=2)
+    json_store.load()
+    for d in (10, 30, 20):
+        json_store.record_run("A", d, 0, 0, "2025-01-02 12:00")
+    json_store.add_player("B")
+    json_store.close()
+    with open(log, "ab") as f:
+        f.write(b'{"type":"run","pla')  # torn tail
+    before = [(tmp_path / name).read_bytes() for name in ("players.json", "runs.jsonl")]
+
+    store = SqlitePlayerStore(str(tmp_path / "players.db"))
+    players = store.load(PlayerStore(summary, log))
+    after = [(tmp_path / name).read_bytes() for name in ("players.json", "runs.jsonl")]
+    assert after == before
+    assert players == {
+        "A": {"Max Distance": 30, "Coins": 0, "Flips": 0},
+        "B": {"Max Distance": 0, "Coins": 0, "Flips": 0},
+    }
+    assert [r["distance"] for r in store.top_runs("distance", 3)] == [30, 20, 10]
+    store.close()
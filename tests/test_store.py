@@ -0,0 +1,88 @@
+import os
+
+from store import PlayerStore
+
+
+def make(tmp_path, **kwargs):
+    return PlayerStore(
+        str(tmp_path / "players.json"), str(tmp_path / "runs.jsonl"), **kwargs
+    )
+
+
+def record(store, name, distance):
+    store.record_run(name, distance, 1, 0, "2025-01-02 12:00")
+
+
+def lose_log_tail(tmp_path, lines):
+    """Drop the last `lines` log lines, as a crash before their fsync would."""
+    path = tmp_path / "runs.jsonl"
+    data = path.read_bytes().splitlines(keepends=True)
+    path.write_bytes(b"".join(data[:-lines]))
+
+
+def seed(tmp_path):
+    store = make(tmp_path, compact_every=5)
+    store.load()
+    store.add_player("A")
+    for d in range(100, 108):
+        record(store, "A", d)
+    store.close()
+
+
+def test_reload_keeps_runs(tmp_path):
+    seed(tmp_path)
+    store = make(tmp_path)
+    players = store.load()
+    assert players["A"]["Max Distance"] == 107
+    assert store.run_count() == 8
+    assert [r["distance"] for r in store.runs()] == list(range(100, 108))
+
+
+def test_runs_after_summary_ahead_of_log_survive_a_crash(tmp_path):
+    seed(tmp_path)
+    lose_log_tail(tmp_path, 3)
+
+    store = make(tmp_path, compact_every=100)
+    store.load()
+    assert store.log_offset == os.path.getsize(tmp_path / "runs.jsonl")
+    record(store, "A", 999)
+    record(store, "B", 998)
+    # no close(): the process dies with only the log lines written
+
+    store = make(tmp_path)
+    players = store.load()
+    assert players["A"]["Max Distance"] == 999
+    assert players["B"]["Max Distance"] == 998
+    assert store.top_runs("distance", 2) == [
+        {
+            "player": "A",
+            "distance": 999,
+            "coins": 1,
+            "flips": 0,
+            "time": "2025-01-02 12:00",
+        },
+        {
+            "player": "B",
+            "distance": 998,
+            "coins": 1,
+            "flips": 0,
+            "time": "2025-01-02 12:00",
+        },
+    ]
+    assert [r["distance"] for r in store.runs()][-2:] == [999, 998]
+
+
+def test_torn_tail_is_cut_and_appends_stay_readable(tmp_path):
+    seed(tmp_path)
+    with open(tmp_path / "runs.jsonl", "ab") as f:
+        f.write(b'{"type":"run","pla')
+
+    store = make(tmp_path)
+    store.load()
+    record(store, "C", 5)
+    store.close()
+
+    store = make(tmp_path)
+    assert "C" in store.load()
+    assert [r["distance"] for r in store.runs()] == [*range(100, 108), 5]
+    assert store.top_runs("coins", 20)[-1]["player"] == "C"
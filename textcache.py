@@ -0,0 +1,91 @@
+import pygame
+
+from lru import LRUCache
+
+DIGITS = "0123456789-"
+
+
+class GlyphAtlas:
+    """The glyphs of one font and colour, rendered once onto a single surface.
+
+    draw() lays a string out glyph by glyph and blits it from the atlas in
+    one surface.blits call, so a number that changes every frame costs no
+    text rendering. Kerning between glyphs is lost, which doesn't show
+    with digits.
+    """
+
+    def __init__(self, font, color, chars=DIGITS):
+        glyphs = [font.render(c, True, color) for c in chars]
+        self.height = max(g.get_height() for g in glyphs)
+        self.surface = pygame.Surface(
+            (sum(g.get_width() for g in glyphs), self.height), pygame.SRCALPHA
+        )
+        self.rects = {}
+        x = 0
+        for c, g in zip(chars, glyphs):
+            # glyphs don't overlap, so MAX copies them without darkening the edges
+            self.surface.blit(g, (x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            self.rects[c] = pygame.Rect(x, 0, g.get_width(), self.height)
+            x += g.get_width()
+
+    def width(self, text):
+        rects = self.rects
+        return sum(rects[c].width for c in text)
+
+    def draw(self, surface, text, pos):
+        """Blit text with its top left at pos and return the x where it ends."""
+        x, y = pos
+        atlas = self.surface
+        seq = []
+        for c in text:
+            r = self.rects[c]
+            seq.append((atlas, (x, y), r))
+            x += r.width
+        surface.blits(seq, doreturn=False)
+        return x
+
+
+def _render(key):
+    font, text, color = key
+    return font.render(text, True, color)
+
+
+class TextCache:
+    """Rendered text surfaces keyed by (font, text, colour).
+
+    render() is a drop-in for font.render(text, True, color) that only
+    rasterizes a string the first time it is asked for; the least recently
+    used entries are dropped beyond max_items. Returned surfaces are
+    shared, so callers must not modify them. atlas() hands out one
+    GlyphAtlas per (font, colour, chars) for values that change too often
+    to be worth caching whole.
+    """
+
+    def __init__(self, max_items=512):
+        self._items = LRUCache(max_items)
+        self._atlases = {}
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def hits(self):
+        return self._items.hits
+
+    @property
+    def misses(self):
+        return self._items.misses
+
+    def render(self, font, text, color):
+        return self._items.get((font, text, color), _render)
+
+    def atlas(self, font, color, chars=DIGITS):
+        key = (font, color, chars)
+        atlas = self._atlases.get(key)
+        if atlas is None:
+            atlas = self._atlases[key] = GlyphAtlas(font, color, chars)
+        return atlas
+
+    def clear(self):
+        self._items.clear()
+        self._atlases.clear()
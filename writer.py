@@ -0,0 +1,64 @@
+import queue
+import threading
+
+_STOP = object()
+
+
+class Writer:
+    """Runs a store's disk writes on a background thread.
+
+    Jobs go into a bounded queue; the thread takes whatever has piled up
+    and hands it to write_batch(jobs) in one call, so a burst of records
+    becomes one write (and one fsync). submit() only blocks once
+    `maxsize` jobs are waiting. A write error stops the writing: the
+    failed batch and every later job are dropped, and submit(), flush()
+    and close() raise the error on the caller's thread, so the files are
+    left as of the last good write instead of with a gap the store has
+    already counted.
+    """
+
+    def __init__(self, write_batch, maxsize=64, name="pyhill-writer"):
+        self.write_batch = write_batch
+        self.queue = queue.Queue(maxsize)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            jobs = [self.queue.get()]
+            while True:
+                try:
+                    jobs.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            batch = [job for job in jobs if job is not _STOP]
+            if batch and self.error is None:
+                try:
+                    self.write_batch(batch)
+                except Exception as e:  # noqa: BLE001 - see _raise()
+                    self.error = e
+            for _ in jobs:
+                self.queue.task_done()
+            if len(batch) < len(jobs):
+                return
+
+    def _raise(self):
+        if self.error is not None:
+            raise self.error
+
+    def submit(self, job):
+        self._raise()
+        self.queue.put(job)
+
+    def flush(self):
+        """Wait until every submitted job is written."""
+        self.queue.join()
+        self._raise()
+
+    def close(self):
+        """Flush and stop the thread."""
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+        self._raise()